@@ -2,6 +2,17 @@ class ApplicationContext:
     def __init__(self):
         self.bot = None
         self.api_client = None
-        self.symbols = []
+        self.outbound = None
+        self.state_backend = None
+        self.render_service = None
+        self.admission = None
+        self.lob_cache = None
+        self.lob_buffers = None
+        self.range_cache = None
+        self.lob_store = None
+        self.chart_cache = None
+        self.metrics_cache = None
+        self.symbol_registry = None
+        self.watcher = None
 
 app_context = ApplicationContext()
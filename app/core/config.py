@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
@@ -6,6 +8,106 @@ class Config(BaseSettings):
     API_BASE: str
     API_USER: str
     API_PASS: str
+
+    # Self-hosted Bot API server; empty means api.telegram.org
+    TELEGRAM_API_URL: str = ""
+
+    # Update delivery: long polling or an aiohttp webhook server
+    BOT_MODE: Literal["polling", "webhook"] = "polling"
+    WEBHOOK_URL: str = ""
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_SECRET: str = ""
+    WEBHOOK_HOST: str = "0.0.0.0"
+    WEBHOOK_PORT: int = 8080
+    WEBHOOK_MAX_CONCURRENCY: int = 64
+    WEBHOOK_SHUTDOWN_TIMEOUT: float = 10.0
+
+    # State shared between replicas: FSM, symbol list, LOB data cache
+    STATE_BACKEND: Literal["memory", "redis"] = "memory"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    STATE_KEY_PREFIX: str = "lob_bot"
+
+    # LOB API HTTP client
+    API_POOL_LIMIT: int = 100
+    API_POOL_LIMIT_PER_HOST: int = 20
+    API_DNS_TTL: int = 300
+    API_KEEPALIVE_TIMEOUT: float = 30.0
+    API_REQUEST_TIMEOUT: float = 15.0
+    API_MAX_RETRIES: int = 3
+    API_TOKEN_REFRESH_MARGIN: float = 60.0
+
+    # Admission control for chart requests: jobs running at once and waiting beyond that
+    CHART_MAX_IN_FLIGHT: int = 8
+    CHART_MAX_QUEUE: int = 32
+
+    # Chart rendering process pool
+    RENDER_WORKERS: int = 4
+    RENDER_MAX_QUEUE: int = 32
+    RENDER_TIMEOUT: float = 30.0
+
+    # LOB data cache
+    LOB_CACHE_TTL: float = 10.0
+    LOB_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CHART_CACHE_SIZE: int = 2000
+
+    # Derived LOB series (/lobstats), computed once per dataset
+    LOB_METRICS_CACHE_TTL: float = 60.0
+    LOB_METRICS_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    LOB_ZSCORE_WINDOW: int = 300
+
+    # Snapshots per chart; charts are downsampled so larger windows render in flat time
+    LOB_DEFAULT_LIMIT: int = 1000
+    LOB_MAX_LIMIT: int = 20000
+
+    # Incremental LOB fetching into per-symbol ring buffers
+    LOB_BUFFER_MAX_SYMBOLS: int = 200
+    LOB_BUFFER_MAX_BYTES: int = 128 * 1024 * 1024
+    LOB_API_SINCE_PARAM: str = "start_time"
+
+    # Time-range history (/check_lob_by_symbol BTCUSDT 24h), fetched in time-window pages
+    LOB_API_UNTIL_PARAM: str = "end_time"
+    LOB_RANGE_PAGE_SECONDS: float = 3600.0
+    LOB_RANGE_CONCURRENCY: int = 4
+    LOB_RANGE_MAX_ROWS: int = 500_000
+    LOB_MAX_RANGE_HOURS: float = 168.0
+    LOB_RANGE_CACHE_TTL: float = 60.0
+    LOB_RANGE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
+    # On-disk store of fetched snapshots under DATA_DIR/lob, reused across restarts
+    LOB_STORE_ENABLED: bool = True
+    LOB_STORE_SEGMENT_ROWS: int = 50_000
+    LOB_STORE_FLUSH_INTERVAL: float = 60.0
+    LOB_STORE_MAX_SEGMENTS: int = 8
+    LOB_STORE_COMPACT_ROWS: int = 1_000_000
+    LOB_STORE_RETENTION_DAYS: float = 30.0
+    LOB_STORE_INGEST_LAG: float = 60.0
+
+    # Outbound Telegram rate limits
+    OUTBOUND_GLOBAL_RATE: float = 30.0
+    OUTBOUND_CHAT_RATE: float = 1.0
+    OUTBOUND_CHAT_BURST: float = 3.0
+    OUTBOUND_MAX_PENDING: int = 1000
+    OUTBOUND_MAX_ATTEMPTS: int = 3
+
+    # /scan
+    SCAN_CONCURRENCY: int = 20
+    SCAN_TOP_N: int = 15
+
+    # /watch alerts; subscriptions are stored under DATA_DIR
+    DATA_DIR: str = "data"
+    WATCH_INTERVAL: float = 30.0
+    WATCH_CONCURRENCY: int = 20
+    WATCH_FANOUT: int = 10
+    WATCH_MAX_PER_CHAT: int = 20
+
+    # Active symbols refresh
+    SYMBOLS_REFRESH_INTERVAL: float = 300.0
+    SYMBOLS_REFRESH_JITTER: float = 30.0
+
+    # Prometheus /metrics endpoint (0 disables it in polling mode) and /stats access
+    METRICS_HOST: str = "0.0.0.0"
+    METRICS_PORT: int = 9100
+    ADMIN_IDS: list[int] = []
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,88 @@
+import asyncio
+import hmac
+import logging
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class WebhookServer:
+    """aiohttp app that feeds Telegram webhook updates to the dispatcher.
+
+    Updates are acknowledged as soon as they are scheduled and processed
+    concurrently, at most `max_concurrency` at a time; when all slots are
+    busy the request waits, which pushes back on Telegram."""
+
+    def __init__(self, bot: Bot, dp: Dispatcher, path: str = '/webhook',
+                 secret: str = '', max_concurrency: int = 64,
+                 shutdown_timeout: float = 10.0):
+        self.bot = bot
+        self.dp = dp
+        self.path = path
+        self.secret = secret
+        self.shutdown_timeout = shutdown_timeout
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._tasks: set[asyncio.Task] = set()
+        self._closing = False
+        self.received = 0
+        self.rejected = 0
+
+        self.app = web.Application()
+        self.app.router.add_post(path, self.handle_update)
+        self.app.router.add_get('/healthz', self.handle_health)
+        self.app.on_shutdown.append(self._on_shutdown)
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if self._closing:
+            return web.Response(status=503, text='shutting down')
+
+        if self.secret and not hmac.compare_digest(
+            request.headers.get(SECRET_HEADER, ''), self.secret
+        ):
+            self.rejected += 1
+            return web.Response(status=401, text='invalid secret token')
+
+        try:
+            update = Update.model_validate(await request.json(), context={'bot': self.bot})
+        except Exception as e:
+            logging.warning(f"Invalid webhook update: {e}")
+            return web.Response(status=400, text='invalid update')
+
+        await self._slots.acquire()
+        self.received += 1
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.json_response({'ok': True})
+
+    async def _process(self, update: Update):
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            logging.exception(f"Error processing update {update.update_id}: {e}")
+        finally:
+            self._slots.release()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            'status': 'stopping' if self._closing else 'ok',
+            'in_flight': len(self._tasks),
+            'received': self.received,
+            'rejected': self.rejected,
+        })
+
+    async def _on_shutdown(self, app: web.Application):
+        """Stop accepting updates and let in-flight ones finish"""
+        self._closing = True
+        if not self._tasks:
+            return
+        logging.info(f"Waiting for {len(self._tasks)} in-flight updates")
+        done, pending = await asyncio.wait(self._tasks, timeout=self.shutdown_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logging.warning(f"Cancelled {len(pending)} updates still running at shutdown")
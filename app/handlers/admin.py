@@ -0,0 +1,66 @@
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from core.app_context import app_context
+from core.config import config
+from services.metrics import API_RESPONSES, EVENT_LOOP_LAG, STAGE_SECONDS
+from services.msg_manager import send_msg
+
+
+router = Router()
+
+
+def format_percentiles(title: str, rows: dict) -> list[str]:
+    lines = [f"{title:<14}{'n':>7}{'p50':>9}{'p95':>9}{'p99':>9}"]
+    for key, row in sorted(rows.items()):
+        name = key[0] if key else 'event loop'
+        lines.append(
+            f"{name:<14}{row['count']:>7}"
+            + ''.join(f"{row[q] * 1000:>9.1f}" for q in (0.5, 0.95, 0.99))
+        )
+    return lines
+
+
+def format_stats() -> str:
+    lines = format_percentiles('stage, ms', STAGE_SECONDS.percentiles())
+    lines.append('')
+    lines += format_percentiles('loop lag, ms', EVENT_LOOP_LAG.percentiles())
+
+    statuses = ', '.join(
+        f"{key[0]}: {int(count)}" for key, count in sorted(API_RESPONSES.values().items())
+    )
+    lines += ['', f"API responses: {statuses or '-'}"]
+
+    if app_context.render_service is not None:
+        render = app_context.render_service.stats()
+        lines.append(
+            f"Render pool: {render['in_flight']} in flight, "
+            f"{render['queue_depth']} queued, {render['rejected']} rejected"
+        )
+    if app_context.admission is not None:
+        admission = app_context.admission.stats()
+        lines.append(
+            f"Chart jobs: {admission['in_flight']} running, {admission['waiting']} queued, "
+            f"{admission['attached']} attached, "
+            f"{admission['rejected_busy'] + admission['rejected_user']} rejected"
+        )
+    for name in ('lob_cache', 'metrics_cache', 'chart_cache'):
+        cache = getattr(app_context, name)
+        if cache is not None:
+            lines.append(f"{name}: hit rate {cache.stats()['hit_rate']:.0%}")
+    if app_context.outbound is not None:
+        outbound = app_context.outbound.stats()
+        lines.append(f"Outbound: {outbound['pending']} pending, {outbound['dropped']} dropped")
+    return '<pre>' + '\n'.join(lines) + '</pre>'
+
+
+# "/stats" - admins only
+@router.message(Command(commands='stats'))
+async def process_stats(message: Message):
+    # Answered here rather than filtered out, so other routers don't take
+    # a non-admin's /stats for a ticker
+    if message.from_user is None or message.from_user.id not in config.ADMIN_IDS:
+        await send_msg(message.chat.id, "This command is only available to bot admins.")
+        return
+    await send_msg(message.chat.id, format_stats(), parse_mode='HTML')
@@ -1,15 +1,27 @@
 import logging
 import asyncio
+import re
+from contextlib import asynccontextmanager
 from aiogram import Router, F
-from aiogram.types import Message
-from aiogram.filters import Command, StateFilter
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, Message
+from aiogram.filters import Command, CommandObject, StateFilter
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 
 from core.app_context import app_context
-from services.lob_data import get_active_symbols, get_lob_depth
-from services.utils import make_chart_depth
-from services.msg_manager import send_image
+from core.config import config
+from keyboards.chart_kb import ALL_PCTS, ChartCallback, chart_keyboard
+from lexicon.lexicon import LEXICON_CHART_TYPES
+from services.admission import AdmissionRejected, Ticket
+from services.lob_data import get_lob_depth
+from services.lob_decode import DEPTH_PCTS
+from services.lob_metrics import format_lobstats, get_lob_metrics
+from services.lob_range import get_lob_range
+from services.metrics import STAGE_SECONDS
+from services.msg_manager import send_msg, send_image, send_media_group, edit_image, photo_file_id
+from services.outbound import OutboundDropped
+from services.scanner import scan_imbalance, format_scan_table
 
 
 class FSMParameters(StatesGroup):
@@ -18,19 +30,29 @@ class FSMParameters(StatesGroup):
 
 router = Router()
 
+# "24h"-style history windows, in seconds per unit
+RANGE_PATTERN = re.compile(r'^(\d+)([MHD])$')
+RANGE_UNITS = {'M': 60, 'H': 3600, 'D': 86400}
+
+# One history fetch per chat, cancelled by /cancel or a newer request
+_range_jobs: dict[int, asyncio.Task] = {}
+
+
+def chart_key(symbol: str, data, pct: int, depth_type: int) -> tuple:
+    """Identifies a rendered chart by the version of the data behind it"""
+    return (symbol, pct, depth_type, data['event_time'].iloc[-1], len(data))
+
+
 # symbols
 @router.message(Command(commands="symbols"))
 async def process_symbols(message: Message):
-    symbols = await get_active_symbols()
+    symbols = app_context.symbol_registry.symbols
     
     if not symbols:
-        await message.answer("❌ No symbols available or error fetching symbols")
+        await send_msg(message.chat.id, "❌ No symbols available or error fetching symbols")
         return
     
-    # Store in app context for later use
-    app_context.symbols = symbols
-    
-    await message.answer(f"📊 Found {len(symbols)} active symbols")
+    await send_msg(message.chat.id, f"📊 Found {len(symbols)} active symbols")
     
     # Split long lists to avoid message limits - use more conservative approach
     from services.utils import split_list_into_strings
@@ -47,11 +69,9 @@ async def process_symbols(message: Message):
                 # Emergency split - send without header
                 emergency_msgs = split_list_into_strings([msg], max_length=4000)
                 for j, emergency_msg in enumerate(emergency_msgs, 1):
-                    await message.answer(f"Symbols continuation...\n{emergency_msg}")
-                    await asyncio.sleep(0.1)
+                    await send_msg(message.chat.id, f"Symbols continuation...\n{emergency_msg}")
             else:
-                await message.answer(message_text)
-                await asyncio.sleep(0.1)
+                await send_msg(message.chat.id, message_text)
                 
         except Exception as e:
             logging.error(f"Error sending symbols part {i}: {e}")
@@ -59,56 +79,407 @@ async def process_symbols(message: Message):
             try:
                 emergency_msgs = split_list_into_strings([msg], max_length=4000)
                 for emergency_msg in emergency_msgs:
-                    await message.answer(emergency_msg)
-                    await asyncio.sleep(0.1)
+                    await send_msg(message.chat.id, emergency_msg)
             except Exception as e2:
                 logging.error(f"Even fallback failed: {e2}")
 
 
+# scan
+@router.message(Command(commands="scan"))
+async def process_scan(message: Message, command: CommandObject):
+    symbols = app_context.symbol_registry.symbols
+    if not symbols:
+        await send_msg(message.chat.id, "Error: Could not fetch available symbols")
+        return
+
+    pct = None
+    if command.args:
+        try:
+            pct = int(command.args.strip().rstrip('%'))
+        except ValueError:
+            pct = -1
+        if pct not in DEPTH_PCTS:
+            await send_msg(message.chat.id, f"Usage: /scan [pct], pct is one of {', '.join(map(str, DEPTH_PCTS))}")
+            return
+
+    level = f"{pct}%" if pct else "any depth level"
+    await send_msg(message.chat.id, f"Scanning {len(symbols)} symbols for bid/ask imbalance at {level}...")
+
+    top, imbalance, scanned = await scan_imbalance(
+        symbols,
+        pct=pct,
+        top_n=config.SCAN_TOP_N,
+        concurrency=config.SCAN_CONCURRENCY
+    )
+    if not scanned:
+        await send_msg(message.chat.id, "No depth data available")
+        return
+
+    await send_msg(
+        message.chat.id,
+        f"Top {len(top)} of {scanned} symbols by |imbalance| at {level}\n"
+        f"imbalance = (bid - ask) / (bid + ask), %\n" + format_scan_table(top, imbalance),
+        parse_mode="HTML"
+    )
+
+
+def format_window(seconds: int) -> str:
+    for unit, size in reversed(RANGE_UNITS.items()):
+        if seconds % size == 0:
+            return f"{seconds // size}{unit.lower()}"
+    return f"{seconds}s"
+
+
+async def run_cancellable(chat_id: int, coro):
+    """Run coro as the chat's history job, cancelling the previous one"""
+    previous = _range_jobs.pop(chat_id, None)
+    if previous is not None:
+        previous.cancel()
+    job = asyncio.create_task(coro)
+    _range_jobs[chat_id] = job
+    try:
+        return await job
+    finally:
+        if _range_jobs.get(chat_id) is job:
+            del _range_jobs[chat_id]
+
+
+@asynccontextmanager
+async def reply_on_error(chat_id: int, symbol: str, action: str):
+    """Report a request's errors to the chat. A /cancel ends it quietly
+    and a full outbound queue silently, shutting down still cancels it."""
+    try:
+        yield
+    except asyncio.CancelledError:
+        # Shutting down, rather than /cancel
+        if asyncio.current_task().cancelling():
+            raise
+    except OutboundDropped:
+        # The outbound queue is full; an error reply would be dropped too
+        pass
+    except Exception as e:
+        logging.exception(f"Error {action} for {symbol}")
+        await send_msg(chat_id, f"Error processing data for {symbol}: {str(e)}")
+
+
+def cancel_job(chat_id: int) -> bool:
+    job = _range_jobs.pop(chat_id, None)
+    if job is None or job.done():
+        return False
+    job.cancel()
+    return True
+
+
+async def notify_gaps(chat_id: int, symbol: str, failed: int):
+    if failed:
+        await send_msg(chat_id, f"⚠️ {failed} page(s) of {symbol} history could not be fetched, "
+                                f"the data has gaps")
+
+
+def rejection_text(error: AdmissionRejected) -> str:
+    if error.reason == 'user':
+        return "⏳ Your previous request is still running, please wait for it to finish."
+    return "⏳ The bot is busy right now, please try again in a minute."
+
+
+async def load_charts(symbol: str, limit: int, window: int, pcts: list[int],
+                      depth_type: int) -> tuple:
+    """The part of a chart request users can share: (data or None,
+    failed history pages, get_charts results)"""
+    if window:
+        data, failed = await get_lob_range(symbol, window)
+    else:
+        data, failed = await get_lob_depth(symbol, limit=limit), 0
+    if data is None or data.empty:
+        return None, failed, []
+    return data, failed, await get_charts(symbol, data, pcts, depth_type)
+
+
+def admit_chart_job(user_id: int, symbol: str, limit: int, window: int,
+                    pcts: list[int], depth_type: int) -> Ticket:
+    """Admission ticket for a chart request; raises AdmissionRejected.
+    Identical requests in flight share one job."""
+    key = (symbol, limit, window, tuple(pcts), depth_type)
+    return app_context.admission.admit(
+        user_id, key, lambda: load_charts(symbol, limit, window, pcts, depth_type)
+    )
+
+
+async def load_lobstats(symbol: str, limit: int, window: int) -> tuple:
+    """The part of a /lobstats request users can share: (metrics or
+    None, failed history pages)"""
+    if window:
+        data, failed = await get_lob_range(symbol, window)
+    else:
+        data, failed = await get_lob_depth(symbol, limit=limit), 0
+    if data is None or data.empty:
+        return None, failed
+    return await get_lob_metrics(symbol, data, config.LOB_ZSCORE_WINDOW), failed
+
+
+async def wait_for_charts(chat_id: int, ticket: Ticket, window: int) -> tuple:
+    """The job's result; time-range requests can be stopped with /cancel"""
+    if window:
+        return await run_cancellable(chat_id, ticket.result())
+    return await ticket.result()
+
+
+# cancel
+@router.message(Command(commands="cancel"))
+async def process_cancel(message: Message, state: FSMContext):
+    cancelled = cancel_job(message.chat.id)
+    if await state.get_state() is not None:
+        await state.clear()
+        cancelled = True
+    await send_msg(message.chat.id, "Cancelled" if cancelled else "Nothing to cancel")
+
+
+# lobstats
+@router.message(Command(commands="lobstats"))
+async def process_lobstats(message: Message, command: CommandObject):
+    try:
+        symbol, limit, window = parse_lob_request(command.args or "")
+    except ValueError as e:
+        await send_msg(message.chat.id, f"Usage: /lobstats SYMBOL [snapshots|24h]. {e}")
+        return
+    if symbol not in app_context.symbol_registry:
+        await send_msg(message.chat.id, f"Symbol '{symbol}' not found.")
+        return
+
+    chat_id = message.chat.id
+    user_id = message.from_user.id if message.from_user else chat_id
+    try:
+        ticket = app_context.admission.admit(
+            user_id, ('lobstats', symbol, limit, window), lambda: load_lobstats(symbol, limit, window)
+        )
+    except AdmissionRejected as e:
+        await send_msg(chat_id, rejection_text(e))
+        return
+
+    with STAGE_SECONDS.time(stage='lobstats'):
+        async with ticket, reply_on_error(chat_id, symbol, "computing LOB stats"):
+            metrics, failed = await wait_for_charts(chat_id, ticket, window)
+            if metrics is None:
+                await send_msg(chat_id, f"No data available for {symbol}")
+                return
+            await notify_gaps(chat_id, symbol, failed)
+            await send_msg(chat_id, format_lobstats(symbol, metrics), parse_mode="HTML")
+
+
 # check_lob_by_symbol
 @router.message(Command(commands="check_lob_by_symbol"))
-async def process_check_lob_by_symbol(message: Message, state: FSMContext):
-    symbols = await get_active_symbols()
-    if not symbols:
-        await message.answer("Error: Could not fetch available symbols")
+async def process_check_lob_by_symbol(message: Message, state: FSMContext,
+                                      command: CommandObject):
+    if not app_context.symbol_registry.symbols:
+        await send_msg(message.chat.id, "Error: Could not fetch available symbols")
+        return
+
+    # "/check_lob_by_symbol BTCUSDT 5000" or "... BTCUSDT 24h" skips the ticker prompt
+    if command.args:
+        await process_lob_request(message, state, command.args)
         return
         
-    app_context.symbols = symbols
-    await message.answer("Input ticker (e.g., BTCUSDT, ETHUSDT):")
+    await send_msg(
+        message.chat.id,
+        f"Input ticker and optional number of snapshots or time range "
+        f"(e.g., BTCUSDT, ETHUSDT {config.LOB_MAX_LIMIT}, SOLUSDT 24h):"
+    )
     await state.set_state(FSMParameters.waiting_for_ticker)
 
 @router.message(StateFilter(FSMParameters.waiting_for_ticker))
 async def process_ticker_input(message: Message, state: FSMContext):
-    symbol = message.text.upper().strip()
+    await process_lob_request(message, state, message.text or "")
+
+
+def parse_lob_request(text: str) -> tuple[str, int, int]:
+    """Parse "SYMBOL [limit|window]" into the symbol, the number of
+    snapshots and the history window in seconds (0 for none)"""
+    parts = text.upper().split()
+    if not parts or len(parts) > 2:
+        raise ValueError("Expected a ticker and an optional number of snapshots or time range")
+
+    limit = config.LOB_DEFAULT_LIMIT
+    window = 0
+    if len(parts) == 2:
+        match = RANGE_PATTERN.match(parts[1])
+        if match:
+            window = int(match[1]) * RANGE_UNITS[match[2]]
+            if not 0 < window <= config.LOB_MAX_RANGE_HOURS * 3600:
+                raise ValueError(f"Time range must be between 1m and {config.LOB_MAX_RANGE_HOURS:g}h")
+        elif not parts[1].isdigit() or not 0 < int(parts[1]) <= config.LOB_MAX_LIMIT:
+            raise ValueError(f"Number of snapshots must be between 1 and {config.LOB_MAX_LIMIT}, "
+                             f"or a time range like 24h")
+        else:
+            limit = int(parts[1])
+    return parts[0], limit, window
+
+
+async def process_lob_request(message: Message, state: FSMContext, text: str):
+    try:
+        symbol, limit, window = parse_lob_request(text)
+    except ValueError as e:
+        await send_msg(message.chat.id, f"{e}. Please try again.")
+        return
     
     # Validate symbol
-    if symbol not in app_context.symbols:
-        await message.answer(f"Symbol '{symbol}' not found. Please enter a valid symbol.")
+    if symbol not in app_context.symbol_registry:
+        await send_msg(message.chat.id, f"Symbol '{symbol}' not found. Please enter a valid symbol.")
         return
     
     await state.clear()
-    await message.answer(f"Fetching LOB data for {symbol}...")
-    
+    await send_depth_charts(message, symbol, limit, window)
+
+
+async def send_depth_charts(message: Message, symbol: str, limit: int, window: int = 0):
+    with STAGE_SECONDS.time(stage='chart_request'):
+        await _send_depth_charts(message, symbol, limit, window)
+
+
+async def _send_depth_charts(message: Message, symbol: str, limit: int, window: int = 0):
+    chat_id = message.chat.id
+    user_id = message.from_user.id if message.from_user else chat_id
     try:
-        # Get LOB data
-        data = await get_lob_depth(symbol, limit=1000)
-        
-        if data is None or data.empty:
-            await message.answer(f"No data available for {symbol}")
-            return
-            
-        await message.answer(f"Retrieved {len(data)} records for {symbol}")
-        
-        # Generate and send charts for different depths 1%, 3%, 5%, 8%
-        for pct in [1, 3, 5, 8]:
+        # One chart with a selector; other charts are rendered on demand
+        ticket = admit_chart_job(user_id, symbol, limit, window, [DEPTH_PCTS[0]], 0)
+    except AdmissionRejected as e:
+        await send_msg(chat_id, rejection_text(e))
+        return
+
+    async with ticket:
+        if window:
+            await send_msg(chat_id, f"Fetching {format_window(window)} of LOB data "
+                                    f"for {symbol}... /cancel to stop")
+        else:
+            await send_msg(chat_id, f"Fetching LOB data for {symbol}...")
+
+        async with reply_on_error(chat_id, symbol, "processing LOB data"):
+            data, failed, charts = await wait_for_charts(chat_id, ticket, window)
+            if data is None:
+                await send_msg(chat_id, f"No data available for {symbol}")
+                return
+
+            await notify_gaps(chat_id, symbol, failed)
+            await send_msg(chat_id, f"Retrieved {len(data)} records for {symbol}")
+            await send_chart(chat_id, symbol, limit, data, DEPTH_PCTS[0], 0,
+                             window=window, chart=charts[0])
+
+
+async def get_charts(symbol: str, data, pcts: list[int], depth_type: int) -> list[tuple]:
+    """(cache key, (image or file_id, description) or exception) per pct:
+    uploaded file_ids are reused and the rest rendered in parallel"""
+    keys = [chart_key(symbol, data, pct, depth_type) for pct in pcts]
+    cached = [app_context.chart_cache.get(key) for key in keys]
+    to_render = [pct for pct, hit in zip(pcts, cached) if hit is None]
+    rendered = dict(zip(to_render, await asyncio.gather(
+        *[app_context.render_service.render(data, pct, depth_type) for pct in to_render],
+        return_exceptions=True
+    )))
+    return [(key, hit or rendered[pct]) for pct, key, hit in zip(pcts, keys, cached)]
+
+
+def remember_file_ids(keys: list[tuple], descriptions: list[str], sent: list):
+    for key, desc, sent_message in zip(keys, descriptions, sent):
+        file_id = photo_file_id(sent_message)
+        if file_id:
+            app_context.chart_cache.set(key, (file_id, desc))
+
+
+async def send_chart(chat_id: int, symbol: str, limit: int, data, pct: int,
+                     depth_type: int, message_id: int = None, window: int = 0,
+                     chart: tuple = None):
+    """Send one chart with the selector keyboard, or swap it into the
+    photo message `message_id` when given. `chart` is a get_charts
+    result when the chart was already rendered."""
+    key, result = chart or (await get_charts(symbol, data, [pct], depth_type))[0]
+    if isinstance(result, Exception):
+        logging.error(f"Error generating chart for {symbol} at {pct}%: {result}")
+        await send_msg(chat_id, f"Error generating chart for {pct}% depth")
+        return
+
+    image, desc = result
+    caption = f"{symbol} - {desc}"
+    filename = f"{symbol}_{pct}pct_{depth_type}.png"
+    keyboard = chart_keyboard(symbol, limit, pct, depth_type, window)
+    sent = None
+    if message_id is not None:
+        try:
+            sent = await edit_image(chat_id, message_id, image, caption,
+                                    filename=filename, reply_markup=keyboard)
+        except TelegramBadRequest as e:
+            if 'message is not modified' in str(e):
+                return
+            logging.warning(f"Could not edit chart message {message_id}: {e}")
+    if sent is None:
+        sent = await send_image(chat_id, image, caption, filename=filename, reply_markup=keyboard)
+    remember_file_ids([key], [desc], [sent])
+
+
+async def send_all_depths(chat_id: int, symbol: str, data, depth_type: int, charts: list = None):
+    """Charts for every depth level as one album"""
+    images = []
+    descriptions = []
+    image_keys = []
+    charts = charts or await get_charts(symbol, data, list(DEPTH_PCTS), depth_type)
+    for pct, (key, result) in zip(DEPTH_PCTS, charts):
+        if isinstance(result, Exception):
+            logging.error(f"Error generating chart for {symbol} at {pct}%: {result}")
+            await send_msg(chat_id, f"Error generating chart for {pct}% depth")
+            continue
+        image, desc = result
+        images.append((image, f"{symbol}_{pct}pct_{depth_type}.png"))
+        descriptions.append(desc)
+        image_keys.append(key)
+
+    if len(images) == 1:
+        sent = [await send_image(chat_id, images[0][0],
+                                 f"{symbol} - {descriptions[0]}", filename=images[0][1])]
+    elif images:
+        caption = f"{symbol}\n" + "\n".join(descriptions)
+        sent = await send_media_group(chat_id, images, caption)
+    else:
+        sent = []
+    remember_file_ids(image_keys, descriptions, sent)
+
+
+# Chart selector buttons
+@router.callback_query(ChartCallback.filter())
+async def process_chart_callback(callback: CallbackQuery, callback_data: ChartCallback):
+    chat_id = callback.from_user.id if callback.message is None else callback.message.chat.id
+    symbol, limit = callback_data.symbol, callback_data.limit
+    pct, depth_type = callback_data.pct, callback_data.depth_type
+    window = callback_data.window
+    if (symbol not in app_context.symbol_registry
+            or not 0 < limit <= config.LOB_MAX_LIMIT
+            or not 0 <= window <= config.LOB_MAX_RANGE_HOURS * 3600
+            or pct not in (ALL_PCTS, *DEPTH_PCTS)
+            or depth_type not in LEXICON_CHART_TYPES):
+        await callback.answer()
+        await send_msg(chat_id, "This chart is no longer available, request it again.")
+        return
+
+    pcts = list(DEPTH_PCTS) if pct == ALL_PCTS else [pct]
+    try:
+        ticket = admit_chart_job(callback.from_user.id, symbol, limit, window, pcts, depth_type)
+    except AdmissionRejected as e:
+        await callback.answer(rejection_text(e))
+        return
+
+    with STAGE_SECONDS.time(stage='chart_callback'):
+        async with ticket:
             try:
-                img_filename, desc = make_chart_depth(data, pct, 0)
-                await send_image(message.chat.id, img_filename, f"{symbol} - {desc}")
-                await asyncio.sleep(0.5)  # Small delay between messages
-            except Exception as e:
-                logging.error(f"Error generating chart for {symbol} at {pct}%: {e}")
-                await message.answer(f"Error generating chart for {pct}% depth")
-                
-    except Exception as e:
-        logging.exception(f"Error processing LOB data for {symbol}")
-        await message.answer(f"Error processing data for {symbol}: {str(e)}")
+                await callback.answer()
+            except TelegramBadRequest as e:
+                # "query is too old" when handled late; the chart can still be sent
+                logging.warning(f"Could not answer chart callback: {e}")
+            async with reply_on_error(chat_id, symbol, "processing chart selection"):
+                data, failed, charts = await wait_for_charts(chat_id, ticket, window)
+                if data is None:
+                    await send_msg(chat_id, f"No data available for {symbol}")
+                    return
+                await notify_gaps(chat_id, symbol, failed)
+                if pct == ALL_PCTS:
+                    await send_all_depths(chat_id, symbol, data, depth_type, charts)
+                else:
+                    message_id = callback.message.message_id if callback.message else None
+                    await send_chart(chat_id, symbol, limit, data, pct, depth_type,
+                                     message_id, window, charts[0])
@@ -2,6 +2,7 @@ from aiogram import Router
 from aiogram.filters import Command, CommandStart
 from lexicon.lexicon import LEXICON
 from aiogram.types import Message
+from services.msg_manager import send_msg
 
 
 router = Router()
@@ -10,10 +11,10 @@ router = Router()
 # "/start" 
 @router.message(CommandStart())
 async def process_start_command(message: Message):
-    await message.answer(LEXICON[message.text])
+    await send_msg(message.chat.id, LEXICON[message.text])
 
 
 # "/help"
 @router.message(Command(commands='help'))
 async def process_help_command(message: Message):
-    await message.answer(LEXICON[message.text])
+    await send_msg(message.chat.id, LEXICON[message.text])
@@ -0,0 +1,95 @@
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from core.app_context import app_context
+from services.lob_decode import DEPTH_PCTS
+from services.msg_manager import send_msg
+from services.watcher import METRICS, SPREAD, describe_watch
+
+
+router = Router()
+
+WATCH_USAGE = (
+    "Usage: /watch SYMBOL pct threshold or /watch SYMBOL spread bps\n"
+    f"pct is one of {', '.join(map(str, DEPTH_PCTS))}; threshold is the bid/ask imbalance "
+    "in %, +30 for bid-heavy only, -30 for ask-heavy only, 30 for either side\n"
+    "e.g. /watch BTCUSDT 3 30, /watch ETHUSDT spread 5"
+)
+
+
+def parse_watch(args: str) -> tuple[str, str, float, int]:
+    """Parse "SYMBOL pct|spread threshold" into (symbol, metric, threshold, direction)"""
+    parts = (args or "").split()
+    if len(parts) != 3:
+        raise ValueError("Expected a ticker, a depth level or 'spread' and a threshold")
+    symbol, metric, value = parts[0].upper(), parts[1].lower().rstrip('%'), parts[2].rstrip('%')
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{parts[1]}'")
+    try:
+        threshold = float(value)
+    except ValueError:
+        raise ValueError(f"Threshold must be a number, got '{parts[2]}'")
+
+    direction = 0
+    if metric == SPREAD:
+        if threshold <= 0:
+            raise ValueError("Spread threshold must be positive")
+    else:
+        if value[0] in '+-':
+            direction = -1 if threshold < 0 else 1
+        threshold = abs(threshold)
+        if not 0 < threshold <= 100:
+            raise ValueError("Imbalance threshold must be between 0 and 100%")
+    return symbol, metric, threshold, direction
+
+
+# "/watch SYMBOL pct threshold"
+@router.message(Command(commands="watch"))
+async def process_watch(message: Message, command: CommandObject):
+    try:
+        symbol, metric, threshold, direction = parse_watch(command.args)
+    except ValueError as e:
+        await send_msg(message.chat.id, f"{e}.\n\n{WATCH_USAGE}")
+        return
+
+    if symbol not in app_context.symbol_registry:
+        await send_msg(message.chat.id, f"Symbol '{symbol}' not found.")
+        return
+
+    try:
+        await app_context.watcher.add(message.chat.id, symbol, metric, threshold, direction)
+    except ValueError as e:
+        await send_msg(message.chat.id, f"{e}. Remove some with /unwatch.")
+        return
+    await send_msg(
+        message.chat.id,
+        f"Watching {symbol}: {describe_watch(metric, threshold, direction)}, "
+        f"checked every {app_context.watcher.interval:g}s"
+    )
+
+
+# "/unwatch SYMBOL [pct|spread]"
+@router.message(Command(commands="unwatch"))
+async def process_unwatch(message: Message, command: CommandObject):
+    parts = (command.args or "").split()
+    metric = parts[1].lower().rstrip('%') if len(parts) == 2 else None
+    if not parts or len(parts) > 2 or (metric is not None and metric not in METRICS):
+        await send_msg(message.chat.id, "Usage: /unwatch SYMBOL [pct|spread]")
+        return
+
+    removed = await app_context.watcher.remove(message.chat.id, parts[0].upper(), metric)
+    await send_msg(message.chat.id, f"Removed {removed} watch(es)" if removed else "No such watch")
+
+
+# "/watches"
+@router.message(Command(commands="watches"))
+async def process_watches(message: Message):
+    watches = await app_context.watcher.watches(message.chat.id)
+    if not watches:
+        await send_msg(message.chat.id, f"No watches. {WATCH_USAGE}")
+        return
+    await send_msg(message.chat.id, "Your watches:\n" + "\n".join(
+        f"{symbol}: {describe_watch(metric, threshold, direction)}"
+        for symbol, metric, threshold, direction in watches
+    ))
@@ -0,0 +1,37 @@
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from lexicon.lexicon import LEXICON_ALL_DEPTHS, LEXICON_CHART_TYPES
+from services.lob_decode import DEPTH_PCTS
+
+
+ALL_PCTS = 0
+
+
+class ChartCallback(CallbackData, prefix='chart'):
+    """A chart of `limit` snapshots of symbol, or of the last `window`
+    seconds when non-zero; pct 0 asks for all depth levels"""
+    symbol: str
+    limit: int
+    pct: int
+    depth_type: int
+    window: int = 0
+
+
+def chart_keyboard(symbol: str, limit: int, pct: int, depth_type: int,
+                   window: int = 0) -> InlineKeyboardMarkup:
+    """Depth level and chart type buttons; the current selection is marked"""
+    def button(label: str, selected: bool, **selection):
+        data = ChartCallback(symbol=symbol, limit=limit, window=window,
+                             **{'pct': pct, 'depth_type': depth_type, **selection})
+        builder.button(text=f"• {label}" if selected else label, callback_data=data)
+
+    builder = InlineKeyboardBuilder()
+    for level in DEPTH_PCTS:
+        button(f"{level}%", level == pct, pct=level)
+    for kind, label in LEXICON_CHART_TYPES.items():
+        button(label, kind == depth_type, depth_type=kind)
+    button(LEXICON_ALL_DEPTHS, False, pct=ALL_PCTS)
+    builder.adjust(len(DEPTH_PCTS), len(LEXICON_CHART_TYPES), 1)
+    return builder.as_markup()
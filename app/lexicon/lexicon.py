@@ -2,7 +2,13 @@ LEXICON: dict[str, str] = {
     '/start': "Limit Order Book Binance Data TG BOT",
     '/help': "Commands: \n\n"
              "/symbols - All active symbols \n"
-             "/check_lob_by_symbol - LOB depths data by symbol \n"
+             "/check_lob_by_symbol [SYMBOL [snapshots|24h]] - LOB depths data by symbol \n"
+             "/cancel - Stop a history fetch \n"
+             "/lobstats SYMBOL [snapshots|24h] - Spread, imbalance and depth z-scores as text \n"
+             "/scan [pct] - Most imbalanced order books across all symbols \n"
+             "/watch SYMBOL pct|spread threshold - Alert when imbalance or spread crosses a threshold \n"
+             "/unwatch SYMBOL [pct|spread] - Stop watching \n"
+             "/watches - Your watches \n"
 }
 
 
@@ -10,4 +16,14 @@ LEXICON_MENU: dict[str, str] = {
     '/help': 'Помощь (команды)',
     '/symbols': 'Active symbols',
     '/check_lob_by_symbol': 'LOB depths data by symbol',
+    '/scan': 'Order book imbalance scanner',
+    '/watches': 'Imbalance and spread alerts',
 }
+
+
+LEXICON_CHART_TYPES: dict[int, str] = {
+    0: 'Volumes',
+    1: 'Bid/Ask ratio',
+    2: 'Diff %',
+}
+LEXICON_ALL_DEPTHS = 'All depths'
@@ -1,17 +1,40 @@
 import logging
 import asyncio
 import os
+import signal
 import sys
+import time
 sys.path.append(os.path.dirname(__file__))
+IMPORTS_STARTED = time.perf_counter()
 
+from aiohttp import web
 from aiogram import Bot, Dispatcher
-from aiogram.types import BotCommand
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.filters import ExceptionTypeFilter
+from aiogram.types import BotCommand, ErrorEvent
 
-from handlers import user, lob
+from handlers import user, lob, admin, watch
 from lexicon.lexicon import LEXICON_MENU
 from core.config import config
 from core.app_context import app_context
+from core.webhook import WebhookServer
 from services.api_client import APIClient
+from services.render_service import RenderService
+from services.admission import AdmissionController
+from services.cache import AsyncTTLCache, LRUCache
+from services.symbol_registry import SymbolRegistry
+from services.lob_buffer import LOBBufferStore
+from services.lob_store import LOBStore
+from services.outbound import OutboundDropped, OutboundScheduler
+from services.watcher import WatchScheduler
+from services.msg_manager import send_msg
+from services.lob_data import get_active_symbols
+from services.lob_decode import frame_to_bytes, frame_from_bytes
+from services.state_backend import create_backend, create_fsm_storage
+from services.metrics import (
+    handle_metrics, monitor_event_loop_lag, register_component, start_metrics_server
+)
 
 
 logging.basicConfig(
@@ -22,6 +45,26 @@ logging.getLogger('matplotlib').setLevel(logging.WARNING)
 logging.getLogger('PIL').setLevel(logging.WARNING)
 logging.getLogger('aiogram.event').setLevel(logging.INFO)
 
+def log_phase(phase: str, since: float) -> float:
+    now = time.perf_counter()
+    logging.info(f"Startup: {phase} took {now - since:.2f}s")
+    return now
+
+async def warm_up(render_service: RenderService):
+    """Start the render workers, which load matplotlib and draw a
+    throwaway chart, once updates are already flowing"""
+    started = time.perf_counter()
+    try:
+        await render_service.start()
+        log_phase("background warm-up", started)
+    except Exception as e:
+        logging.exception(f"Warm-up failed: {e}")
+
+async def on_outbound_dropped(event: ErrorEvent):
+    """A reply dropped by a full outbound queue ends its handler quietly;
+    the drop is already logged and counted"""
+    logging.debug(f"Update {event.update.update_id} stopped: {event.exception}")
+
 async def set_main_menu(bot: Bot):
     main_menu_commands = [
         BotCommand(command=command, description=description)
@@ -29,39 +72,231 @@ async def set_main_menu(bot: Bot):
     ]
     await bot.set_my_commands(main_menu_commands)
 
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    """Serve updates from an aiohttp app until SIGINT/SIGTERM"""
+    server = WebhookServer(
+        bot, dp,
+        path=config.WEBHOOK_PATH,
+        secret=config.WEBHOOK_SECRET,
+        max_concurrency=config.WEBHOOK_MAX_CONCURRENCY,
+        shutdown_timeout=config.WEBHOOK_SHUTDOWN_TIMEOUT
+    )
+    server.app.router.add_get('/metrics', handle_metrics)
+    register_component('webhook', lambda: {
+        'received': server.received,
+        'rejected': server.rejected,
+        'in_flight': len(server._tasks),
+    })
+    runner = web.AppRunner(server.app)
+    await runner.setup()
+    site = web.TCPSite(runner, config.WEBHOOK_HOST, config.WEBHOOK_PORT)
+    await site.start()
+
+    # Without a public URL the server only takes locally POSTed updates
+    if config.WEBHOOK_URL:
+        await bot.set_webhook(
+            url=config.WEBHOOK_URL.rstrip('/') + config.WEBHOOK_PATH,
+            secret_token=config.WEBHOOK_SECRET or None,
+            max_connections=config.WEBHOOK_MAX_CONCURRENCY,
+            drop_pending_updates=True
+        )
+    logging.info(
+        f"Starting LOB TG BOT in webhook mode on "
+        f"{config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}"
+    )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await dp.emit_startup(bot=bot)
+    try:
+        await stop.wait()
+    finally:
+        logging.info("Stopping webhook server")
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot)
+
 async def main():
+    phase = log_phase("imports", IMPORTS_STARTED)
+
     # Initialize bot and dispatcher
-    bot = Bot(token=config.TG_BOT_TOKEN)    
-    dp = Dispatcher()
+    session = None
+    if config.TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(config.TELEGRAM_API_URL))
+    bot = Bot(token=config.TG_BOT_TOKEN, session=session)
+    dp = Dispatcher(storage=create_fsm_storage(
+        config.STATE_BACKEND, config.REDIS_URL, key_prefix=f"{config.STATE_KEY_PREFIX}:fsm"
+    ))
+
+    # State shared between replicas when a Redis backend is configured
+    state_backend = create_backend(config.STATE_BACKEND, config.REDIS_URL)
+    shared_backend = state_backend if state_backend.shared else None
 
     # Initialize API client
     api_client = APIClient(
         base_url=config.API_BASE,
         username=config.API_USER,
-        password=config.API_PASS
+        password=config.API_PASS,
+        pool_limit=config.API_POOL_LIMIT,
+        pool_limit_per_host=config.API_POOL_LIMIT_PER_HOST,
+        dns_ttl=config.API_DNS_TTL,
+        keepalive_timeout=config.API_KEEPALIVE_TIMEOUT,
+        request_timeout=config.API_REQUEST_TIMEOUT,
+        max_retries=config.API_MAX_RETRIES,
+        refresh_margin=config.API_TOKEN_REFRESH_MARGIN
     )
     
+    # Initialize chart render pool; workers are spawned by the warm-up
+    render_service = RenderService(
+        workers=config.RENDER_WORKERS,
+        max_queue=config.RENDER_MAX_QUEUE,
+        timeout=config.RENDER_TIMEOUT
+    )
+
     # Store in app context
     app_context.bot = bot
     app_context.api_client = api_client
+    app_context.outbound = OutboundScheduler(
+        global_rate=config.OUTBOUND_GLOBAL_RATE,
+        chat_rate=config.OUTBOUND_CHAT_RATE,
+        chat_burst=config.OUTBOUND_CHAT_BURST,
+        max_pending=config.OUTBOUND_MAX_PENDING,
+        max_attempts=config.OUTBOUND_MAX_ATTEMPTS
+    )
+    app_context.render_service = render_service
+    app_context.admission = AdmissionController(
+        max_in_flight=config.CHART_MAX_IN_FLIGHT,
+        max_queue=config.CHART_MAX_QUEUE
+    )
+    app_context.state_backend = state_backend
+    app_context.lob_cache = AsyncTTLCache(
+        ttl=config.LOB_CACHE_TTL,
+        max_bytes=config.LOB_CACHE_MAX_BYTES,
+        backend=shared_backend,
+        namespace=f"{config.STATE_KEY_PREFIX}:lob",
+        dumps=frame_to_bytes,
+        loads=frame_from_bytes
+    )
+    app_context.range_cache = AsyncTTLCache(
+        ttl=config.LOB_RANGE_CACHE_TTL,
+        max_bytes=config.LOB_RANGE_CACHE_MAX_BYTES
+    )
+    app_context.metrics_cache = AsyncTTLCache(
+        ttl=config.LOB_METRICS_CACHE_TTL,
+        max_bytes=config.LOB_METRICS_CACHE_MAX_BYTES,
+        sizeof=lambda metrics: metrics.nbytes
+    )
+    app_context.chart_cache = LRUCache(max_entries=config.CHART_CACHE_SIZE)
+    app_context.lob_buffers = LOBBufferStore(
+        max_symbols=config.LOB_BUFFER_MAX_SYMBOLS,
+        max_bytes=config.LOB_BUFFER_MAX_BYTES,
+    )
+    lob_store = None
+    if config.LOB_STORE_ENABLED:
+        lob_store = LOBStore(
+            root=os.path.join(config.DATA_DIR, "lob"),
+            segment_rows=config.LOB_STORE_SEGMENT_ROWS,
+            max_segments=config.LOB_STORE_MAX_SEGMENTS,
+            compact_rows=config.LOB_STORE_COMPACT_ROWS,
+            retention_days=config.LOB_STORE_RETENTION_DAYS,
+            ingest_lag=config.LOB_STORE_INGEST_LAG,
+            flush_interval=config.LOB_STORE_FLUSH_INTERVAL
+        )
+        app_context.lob_store = lob_store
+        await lob_store.start()
+
+    # Load active symbols and keep them fresh in the background
+    symbol_registry = SymbolRegistry(
+        fetcher=get_active_symbols,
+        interval=config.SYMBOLS_REFRESH_INTERVAL,
+        jitter=config.SYMBOLS_REFRESH_JITTER,
+        backend=shared_backend,
+        key=f"{config.STATE_KEY_PREFIX}:symbols"
+    )
+    app_context.symbol_registry = symbol_registry
+    phase = log_phase("components", phase)
+    await symbol_registry.start()
+    phase = log_phase("symbols", phase)
+
+    # Background poller for /watch alerts
+    watcher = WatchScheduler(
+        send=send_msg,
+        path=os.path.join(config.DATA_DIR, "watches.json"),
+        interval=config.WATCH_INTERVAL,
+        concurrency=config.WATCH_CONCURRENCY,
+        fanout=config.WATCH_FANOUT,
+        max_per_chat=config.WATCH_MAX_PER_CHAT,
+        backend=shared_backend,
+        key=f"{config.STATE_KEY_PREFIX}:watches"
+    )
+    app_context.watcher = watcher
+    await watcher.start()
+
+    # Component stats on /metrics and event loop lag sampling
+    register_component('render', render_service.stats)
+    register_component('admission', app_context.admission.stats)
+    register_component('lob_cache', app_context.lob_cache.stats)
+    register_component('range_cache', app_context.range_cache.stats)
+    register_component('metrics_cache', app_context.metrics_cache.stats)
+    register_component('chart_cache', app_context.chart_cache.stats)
+    register_component('lob_buffers', app_context.lob_buffers.stats)
+    if lob_store is not None:
+        register_component('lob_store', lob_store.stats)
+    register_component('outbound', app_context.outbound.stats)
+    register_component('symbols', lambda: {'count': len(symbol_registry)})
+    register_component('watcher', watcher.stats)
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
 
     # Set main menu
     await set_main_menu(bot)
+    log_phase("menu", phase)
 
     # Register routers
     dp.include_router(user.router)
+    dp.include_router(admin.router)
+    dp.include_router(watch.router)
     dp.include_router(lob.router)
+    dp.errors.register(on_outbound_dropped, ExceptionTypeFilter(OutboundDropped))
+
+    # Warm up in the background as soon as updates start flowing
+    warm_up_tasks = []
+
+    async def start_warm_up():
+        warm_up_tasks.append(asyncio.create_task(warm_up(render_service)))
+
+    dp.startup.register(start_warm_up)
+    logging.info(f"Startup: ready in {time.perf_counter() - IMPORTS_STARTED:.2f}s")
 
+    metrics_runner = None
     try:
-        # Skip accumulated updates and start polling
-        await bot.delete_webhook(drop_pending_updates=True)
-        logging.info("Starting LOB TG BOT in Docker container")
-        await dp.start_polling(bot)
+        if config.BOT_MODE == "webhook":
+            await run_webhook(bot, dp)
+        else:
+            if config.METRICS_PORT:
+                metrics_runner = await start_metrics_server(config.METRICS_HOST, config.METRICS_PORT)
+            # Skip accumulated updates and start polling
+            await bot.delete_webhook(drop_pending_updates=True)
+            logging.info("Starting LOB TG BOT in Docker container")
+            await dp.start_polling(bot)
     except Exception as e:
         logging.exception(f"Bot stopped with error: {e}")
     finally:
         # Cleanup
+        lag_monitor.cancel()
+        for task in warm_up_tasks:
+            task.cancel()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await watcher.stop()
+        await symbol_registry.stop()
+        if lob_store is not None:
+            await lob_store.stop()
+        await render_service.close()
         await api_client.close()
+        await dp.storage.close()
+        await state_backend.close()
         await bot.session.close()
 
 if __name__ == "__main__":
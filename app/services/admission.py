@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from services.metrics import STAGE_SECONDS
+
+
+class AdmissionRejected(Exception):
+    """Raised by AdmissionController.admit; `reason` is 'busy' or 'user'"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class _Job:
+    def __init__(self, key: Optional[Hashable]):
+        self.key = key
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+
+
+class Ticket:
+    """An admitted request. Use as an async context manager around
+    awaiting `result()`; leaving it frees the user's slot and, if no one
+    else waits for the job, cancels the job."""
+
+    def __init__(self, controller: 'AdmissionController', user_id: int, job: _Job):
+        self.controller = controller
+        self.user_id = user_id
+        self.job = job
+        job.waiters += 1
+        self._released = False
+
+    async def result(self) -> Any:
+        # Cancelling one waiter must not cancel the job the others wait for
+        return await asyncio.shield(self.job.task)
+
+    async def __aenter__(self) -> 'Ticket':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.controller._release(self)
+
+
+class AdmissionController:
+    """Bounds the chart work users can queue.
+
+    At most `max_in_flight` jobs run at once and `max_queue` more wait
+    for a slot; past that requests are rejected at once rather than
+    queued. Each user has at most one request in flight. Requests with
+    the same key while a job for it is queued or running attach to that
+    job instead of starting another, and share its result."""
+
+    def __init__(self, max_in_flight: int = 8, max_queue: int = 32):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._jobs: dict[Hashable, _Job] = {}
+        self._users: set[int] = set()
+        self._pending: set[asyncio.Task] = set()
+        self.in_flight = 0
+        self.admitted = 0
+        self.attached = 0
+        self.rejected_busy = 0
+        self.rejected_user = 0
+
+    def admit(self, user_id: int, key: Optional[Hashable],
+              produce: Callable[[], Awaitable[Any]]) -> Ticket:
+        """Admit a request or raise AdmissionRejected without waiting.
+        produce() runs as a shared job unless one with the same key is
+        already pending (key None never shares)."""
+        if user_id in self._users:
+            self.rejected_user += 1
+            raise AdmissionRejected('user', "Your previous request is still running")
+
+        job = self._jobs.get(key) if key is not None else None
+        if job is None:
+            if len(self._pending) >= self.max_in_flight + self.max_queue:
+                self.rejected_busy += 1
+                raise AdmissionRejected('busy', "The bot is busy right now")
+            job = _Job(key)
+            job.task = asyncio.create_task(self._run(job, produce))
+            self._pending.add(job.task)
+            job.task.add_done_callback(self._pending.discard)
+            if key is not None:
+                self._jobs[key] = job
+            self.admitted += 1
+        else:
+            self.attached += 1
+
+        self._users.add(user_id)
+        return Ticket(self, user_id, job)
+
+    async def _run(self, job: _Job, produce: Callable[[], Awaitable[Any]]) -> Any:
+        queued = time.perf_counter()
+        try:
+            await self._slots.acquire()
+            STAGE_SECONDS.observe(time.perf_counter() - queued, stage='admission_wait')
+            self.in_flight += 1
+            try:
+                return await produce()
+            finally:
+                self.in_flight -= 1
+                self._slots.release()
+        finally:
+            if job.key is not None and self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+
+    def _release(self, ticket: Ticket):
+        self._users.discard(ticket.user_id)
+        job = ticket.job
+        job.waiters -= 1
+        if job.waiters == 0 and not job.task.done():
+            # Everyone gave up on it
+            job.task.cancel()
+            if job.key is not None and self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+            logging.info(f"Abandoned chart job {job.key} cancelled")
+
+    @property
+    def waiting(self) -> int:
+        return len(self._pending) - self.in_flight
+
+    def stats(self) -> dict:
+        return {
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'users': len(self._users),
+            'admitted': self.admitted,
+            'attached': self.attached,
+            'rejected_busy': self.rejected_busy,
+            'rejected_user': self.rejected_user,
+        }
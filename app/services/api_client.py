@@ -1,47 +1,117 @@
 import aiohttp
+import asyncio
+import base64
+import json
 import logging
-from typing import Optional, Dict
+import random
+import time
+from typing import Optional, Dict, Union
 from datetime import datetime, timedelta
 
+from services.metrics import API_RESPONSES, STAGE_SECONDS
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def jwt_expiry(token: str) -> Optional[datetime]:
+    """Read the `exp` claim of a JWT without verifying its signature"""
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return datetime.fromtimestamp(float(claims['exp']))
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
 
 class APIClient:
-    def __init__(self, base_url: str, username: str, password: str):
+    def __init__(self, base_url: str, username: str, password: str,
+                 pool_limit: int = 100, pool_limit_per_host: int = 20,
+                 dns_ttl: int = 300, keepalive_timeout: float = 30.0,
+                 request_timeout: float = 15.0, max_retries: int = 3,
+                 backoff_base: float = 0.25, backoff_max: float = 4.0,
+                 refresh_margin: float = 60.0):
         self.base_url = base_url.rstrip('/')
         self.username = username
         self.password = password
         self.token = None
         self.token_expiry = None
         self.session = None
+        self.pool_limit = pool_limit
+        self.pool_limit_per_host = pool_limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.refresh_margin = refresh_margin
+        self._session_lock = asyncio.Lock()
+        self._refresh_task = None
+        self._renewal_task = None
 
     async def ensure_session(self):
-        if not self.session:
-            self.session = aiohttp.ClientSession()
-            await self.authenticate()
+        if self.session:
+            return
+        async with self._session_lock:
+            if self.session:
+                return
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_limit,
+                limit_per_host=self.pool_limit_per_host,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self.session = aiohttp.ClientSession(connector=connector)
+        await self.refresh_token()
 
     async def close(self):
+        for task in (self._renewal_task, self._refresh_task):
+            if task:
+                task.cancel()
+        self._renewal_task = None
+        self._refresh_task = None
         if self.session:
             await self.session.close()
             self.session = None
 
+    async def refresh_token(self) -> bool:
+        """Re-authenticate once for all concurrent callers"""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh())
+        return await asyncio.shield(self._refresh_task)
+
+    async def _refresh(self) -> bool:
+        try:
+            return await self.authenticate()
+        finally:
+            self._refresh_task = None
+
     async def authenticate(self) -> bool:
         """Authenticate and get JWT token"""
         auth_data = {
             'username': self.username,
             'password': self.password
         }
-        
+
         try:
             async with self.session.post(
                 f"{self.base_url}/auth/token",
                 data=aiohttp.FormData(auth_data),
-                headers={'accept': 'application/json'}
+                headers={'accept': 'application/json'},
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
             ) as response:
                 if response.status == 200:
                     result = await response.json()
                     self.token = result['access_token']
-                    # Предполагаем, что токен живет 30 минут
-                    self.token_expiry = datetime.now() + timedelta(minutes=30)
-                    logging.info("Successfully authenticated with API")
+                    self.token_expiry = jwt_expiry(self.token)
+                    if self.token_expiry is None:
+                        # No exp claim: fall back to expires_in or 30 minutes
+                        lifetime = float(result.get('expires_in') or 30 * 60)
+                        self.token_expiry = datetime.now() + timedelta(seconds=lifetime)
+                    self._schedule_renewal()
+                    logging.info(f"Successfully authenticated with API, token valid until {self.token_expiry}")
                     return True
                 else:
                     logging.error(f"Authentication failed: {response.status}")
@@ -50,51 +120,116 @@ class APIClient:
             logging.exception(f"Authentication error: {e}")
             return False
 
+    def _schedule_renewal(self):
+        """Refresh the token in the background shortly before it expires"""
+        if self._renewal_task:
+            self._renewal_task.cancel()
+        delay = (self.token_expiry - datetime.now()).total_seconds() - self.refresh_margin
+        self._renewal_task = asyncio.create_task(self._renew_after(max(1.0, delay)))
+
+    async def _renew_after(self, delay: float, attempt: int = 0):
+        await asyncio.sleep(delay)
+        if await self.refresh_token():
+            return
+        # Keep trying with backoff until the token expires; after that
+        # the next request refreshes it on demand
+        if self.token_expiry is not None and datetime.now() < self.token_expiry:
+            self._renewal_task = asyncio.create_task(
+                self._renew_after(self._backoff(attempt), attempt + 1)
+            )
+
     async def is_token_valid(self) -> bool:
         """Check if token is still valid"""
-        return self.token and self.token_expiry and datetime.now() < self.token_expiry
+        return bool(self.token and self.token_expiry and datetime.now() < self.token_expiry)
 
     async def get(self, endpoint: str, params: Optional[Dict] = None) -> Dict:
         """Make authenticated GET request"""
+        return await self._get(endpoint, params, raw=False)
+
+    async def get_bytes(self, endpoint: str, params: Optional[Dict] = None) -> Union[bytes, Dict]:
+        """Make authenticated GET request and return the undecoded body,
+        or an error dict on failure"""
+        return await self._get(endpoint, params, raw=True)
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _get(self, endpoint: str, params: Optional[Dict], raw: bool):
+        with STAGE_SECONDS.time(stage='api'):
+            return await self._get_with_retries(endpoint, params, raw)
+
+    async def _get_with_retries(self, endpoint: str, params: Optional[Dict], raw: bool):
+        """GET with retries on transient failures, all within one
+        request_timeout budget"""
         await self.ensure_session()
-        
+
         if not await self.is_token_valid():
-            if not await self.authenticate():
+            if not await self.refresh_token():
                 return {"error": "Authentication failed"}
 
-        headers = {
-            'accept': 'application/json',
-            'Authorization': f'Bearer {self.token}'
-        }
-
         url = f"{self.base_url}{endpoint}"
-        
-        try:
-            async with self.session.get(
-                url, 
-                params=params, 
-                headers=headers
-            ) as response:
-                if response.status == 401:  # Token expired
-                    logging.info("Token expired, re-authenticating...")
-                    if await self.authenticate():
-                        # Retry with new token
-                        headers['Authorization'] = f'Bearer {self.token}'
-                        async with self.session.get(
-                            url, params=params, headers=headers
-                        ) as retry_response:
-                            return await self._handle_response(retry_response)
-                    else:
-                        return {"error": "Re-authentication failed"}
-                
-                return await self._handle_response(response)
-        except Exception as e:
-            logging.exception(f"Request error: {e}")
-            return {"error": str(e)}
+        deadline = time.monotonic() + self.request_timeout
+        reauthenticated = False
+        attempt = 0
+        error = None
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return {"error": f"Request timed out: {error}" if error else "Request timed out"}
+
+            token = self.token
+            headers = {
+                'accept': 'application/json',
+                'Authorization': f'Bearer {token}'
+            }
+            try:
+                async with self.session.get(
+                    url,
+                    params=params,
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=remaining)
+                ) as response:
+                    API_RESPONSES.inc(status=response.status)
+                    if response.status == 401 and not reauthenticated:  # Token expired
+                        reauthenticated = True
+                        # Only the first caller that sees the stale token refreshes it
+                        if self.token == token:
+                            logging.info("Token expired, re-authenticating...")
+                            if not await self.refresh_token():
+                                return {"error": "Re-authentication failed"}
+                        continue
+
+                    if response.status not in RETRY_STATUSES or attempt >= self.max_retries:
+                        return await self._handle_response(response, raw)
+                    error = f"HTTP {response.status}"
+                    retry_after = response.headers.get('Retry-After')
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                API_RESPONSES.inc(status=type(e).__name__)
+                if attempt >= self.max_retries:
+                    logging.exception(f"Request error: {e}")
+                    return {"error": str(e) or type(e).__name__}
+                error = str(e) or type(e).__name__
+                retry_after = None
+            except Exception as e:
+                logging.exception(f"Request error: {e}")
+                return {"error": str(e)}
+
+            delay = self._backoff(attempt)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            if time.monotonic() + delay >= deadline:
+                return {"error": f"Request budget exhausted: {error}"}
+            attempt += 1
+            logging.warning(f"GET {endpoint} failed ({error}), retry {attempt} in {delay:.2f}s")
+            await asyncio.sleep(delay)
 
-    async def _handle_response(self, response):
+    async def _handle_response(self, response, raw: bool = False):
         """Handle API response"""
         if response.status == 200:
+            if raw:
+                return await response.read()
             return await response.json()
         else:
             error_text = await response.text()
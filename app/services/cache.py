@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+
+def default_sizeof(value: Any) -> int:
+    """Approximate memory footprint of a cached value in bytes"""
+    memory_usage = getattr(value, 'memory_usage', None)
+    if callable(memory_usage):
+        try:
+            return int(memory_usage(index=True, deep=True).sum())
+        except TypeError:
+            pass
+    return sys.getsizeof(value)
+
+
+class AsyncTTLCache:
+    """Async cache with TTL expiry, LRU eviction bounded by memory
+    and single-flight loading: concurrent misses for the same key share
+    one in-flight loader call.
+
+    With a shared `backend` (see services.state_backend) local misses
+    are looked up there before calling the loader, and loaded values
+    are written back, so replicas share each other's fetches."""
+
+    def __init__(self, ttl: float, max_bytes: int,
+                 sizeof: Callable[[Any], int] = default_sizeof,
+                 backend=None, namespace: str = 'cache',
+                 dumps: Callable[[Any], bytes] = None,
+                 loads: Callable[[bytes], Any] = None):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.backend = backend
+        self.namespace = namespace
+        self.dumps = dumps
+        self.loads = loads
+        self.shared_hits = 0
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, size, value)
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            logging.warning(f"Cache value for {key} is too large ({size} bytes), not cached")
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        if key in self._entries:
+            self._remove(key)
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value or load it once for all concurrent callers.
+        None results are returned to every waiter but not cached."""
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.create_task(self._load(key, loader))
+            self._in_flight[key] = task
+        # A cancelled caller must not cancel the load other callers wait for
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await self._load_shared(key)
+            if value is not None:
+                self.shared_hits += 1
+                self.set(key, value)
+                return value
+
+            value = await loader()
+            if value is not None:
+                self.set(key, value)
+                await self._store_shared(key, value)
+            return value
+        finally:
+            del self._in_flight[key]
+
+    def _backend_key(self, key: Hashable) -> str:
+        parts = key if isinstance(key, tuple) else (key,)
+        return ':'.join([self.namespace, *map(str, parts)])
+
+    async def _load_shared(self, key: Hashable) -> Optional[Any]:
+        if self.backend is None:
+            return None
+        try:
+            raw = await self.backend.get(self._backend_key(key))
+            return None if raw is None else self.loads(raw)
+        except Exception as e:
+            logging.warning(f"Shared cache read failed for {key}: {e}")
+            return None
+
+    async def _store_shared(self, key: Hashable, value: Any):
+        if self.backend is None:
+            return
+        try:
+            await self.backend.set(self._backend_key(key), self.dumps(value), ttl=self.ttl)
+        except Exception as e:
+            logging.warning(f"Shared cache write failed for {key}: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'shared_hits': self.shared_hits,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+
+class LRUCache:
+    """Bounded LRU mapping with hit/miss counters"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
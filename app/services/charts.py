@@ -0,0 +1,143 @@
+import io
+import logging
+
+import matplotlib
+
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+import numpy as np
+import pandas as pd
+
+from services.downsample import downsample
+from services.lob_metrics import bid_ask_ratio, depth_imbalance
+from services.utils import get_depths
+
+
+class _ChartTemplate:
+    """Reusable 2-axis figure; each chart only swaps the line data"""
+
+    width_px, height_px = 500, 900
+    dpi = 100
+    # Two points (min and max) per horizontal pixel keep every spike visible
+    max_points = 2 * width_px
+
+    def __init__(self):
+        plt.ioff()
+        plt.style.use('dark_background')
+
+        self.fig, (self.ax1, self.ax2) = plt.subplots(
+            2, 1, figsize=(self.width_px / self.dpi, self.height_px / self.dpi),
+            sharex=True, dpi=self.dpi
+        )
+
+        # Top plot: best bid/ask
+        self.bid_line, = self.ax1.plot([], [], color='green', label='Best Bid', linewidth=1)
+        self.ask_line, = self.ax1.plot([], [], color='red', label='Best Ask', linewidth=1)
+        self.ax1.set_ylabel('Price', color='white')
+        self.ax1.legend()
+        self.ax1.tick_params(axis='y', colors='white')
+        self.ax1.grid(True, linestyle='--', alpha=0.3, color='gray')
+
+        # Bottom plot: up to two depth series
+        self.depth_lines = (
+            self.ax2.plot([], [], linewidth=1)[0],
+            self.ax2.plot([], [], linewidth=1)[0],
+        )
+        self.ax2.tick_params(axis='y', colors='white')
+        self.ax2.tick_params(axis='x', labelrotation=45)
+        self.ax2.grid(True, linestyle='--', alpha=0.3, color='gray')
+        self.ax2.xaxis_date()
+
+    def draw(self, x, top, bottom, ylabel: str) -> bytes:
+        """Update the lines in place and encode the figure as PNG.
+        Series longer than max_points are downsampled first, so render
+        cost does not grow with the number of rows."""
+        self.bid_line.set_data(*downsample(x, top[0], self.max_points))
+        self.ask_line.set_data(*downsample(x, top[1], self.max_points))
+
+        for line, series in zip(self.depth_lines, bottom + [None]):
+            if series is None:
+                line.set_data([], [])
+                line.set_visible(False)
+                line.set_label('_hidden')
+                continue
+            y, color, label = series
+            line.set_data(*downsample(x, y, self.max_points))
+            line.set_color(color)
+            line.set_label(label)
+            line.set_visible(True)
+
+        self.ax2.set_ylabel(ylabel, color='white')
+        self.ax2.legend()
+        for ax in (self.ax1, self.ax2):
+            ax.relim(visible_only=True)
+            ax.autoscale_view()
+
+        self.fig.tight_layout()
+
+        buffer = io.BytesIO()
+        self.fig.savefig(buffer, format='png', dpi=self.dpi, bbox_inches='tight',
+                         facecolor='#1a1a1a', edgecolor='none')
+        return buffer.getvalue()
+
+
+_template = None
+
+
+def _get_template() -> _ChartTemplate:
+    global _template
+    if _template is None:
+        _template = _ChartTemplate()
+    return _template
+
+
+def make_chart_depth(df: pd.DataFrame, pct: int, depth_type: int) -> tuple[bytes, str]:
+    """Render a depth chart and return the PNG bytes and its description"""
+    if df.empty:
+        raise ValueError("DataFrame is empty")
+    
+    if 'event_time' not in df.columns:
+        raise ValueError("DataFrame must contain 'event_time' column")
+    
+    if df['event_time'].is_monotonic_increasing:
+        df_sorted = df
+    else:
+        df_sorted = df.sort_values('event_time').reset_index(drop=True)
+    x = mdates.date2num(df_sorted['event_time'])
+    top = [df_sorted['best_bid'].to_numpy(), df_sorted['best_ask'].to_numpy()]
+
+    depth_lst = get_depths(pct)
+    bid_vol = df_sorted[depth_lst[0]].to_numpy(dtype=float)
+    ask_vol = df_sorted[depth_lst[1]].to_numpy(dtype=float)
+
+    # Bottom plot based on depth type
+    if depth_type == 0:
+        description = f"Depth ({pct}% Bid/Ask)"
+        ylabel = 'Volume'
+        bottom = [(bid_vol, 'lightgreen', f'Bid {pct}%'),
+                  (ask_vol, 'lightcoral', f'Ask {pct}%')]
+    elif depth_type == 1:
+        description = f"Depth ({pct}% K Bid/Ask)"
+        ylabel = 'Ratio'
+        bottom = [(bid_ask_ratio(bid_vol, ask_vol), 'blue', 'Bid/Ask Ratio')]
+    elif depth_type == 2:
+        description = f"Depth ({pct}% diff % Bids-Asks)"
+        ylabel = 'Difference %'
+        bottom = [(depth_imbalance(bid_vol, ask_vol), 'cyan', 'Bid-Ask Diff %')]
+    else:
+        raise ValueError(f"Invalid depth_type: {depth_type}. Must be one of [0, 1, 2]")
+
+    image = _get_template().draw(x, top, bottom, ylabel)
+    logging.info(f"Chart rendered: {description}, {len(image)} bytes")
+    return image, description
+
+
+def warm_up():
+    """Load fonts and style and build the figure with a throwaway chart,
+    so the first real chart renders at full speed"""
+    if _template is not None:
+        return
+    x = np.arange(100, dtype=float) + mdates.date2num(np.datetime64('2024-01-01'))
+    y = np.linspace(1.0, 2.0, 100)
+    _get_template().draw(x, [y, y + 0.1], [(y, 'lightgreen', 'warm-up')], 'Volume')
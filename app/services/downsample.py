@@ -0,0 +1,31 @@
+import numpy as np
+
+
+def minmax_indices(y: np.ndarray, n_buckets: int) -> np.ndarray:
+    """Indices of the min and max of each of `n_buckets` equal buckets,
+    plus the first and last point, in ascending order. Keeps spikes
+    that plain decimation would drop. NaNs are ignored."""
+    n = len(y)
+    size = -(-n // n_buckets)  # ceil
+    n_buckets = -(-n // size)
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(n_buckets, size)
+
+    missing = np.isnan(padded)
+    lows = np.argmin(np.where(missing, np.inf, padded), axis=1)
+    highs = np.argmax(np.where(missing, -np.inf, padded), axis=1)
+
+    offsets = np.arange(n_buckets) * size
+    indices = np.concatenate(([0, n - 1], offsets + lows, offsets + highs))
+    indices = np.unique(indices)
+    return indices[indices < n]
+
+
+def downsample(x: np.ndarray, y: np.ndarray, max_points: int) -> tuple[np.ndarray, np.ndarray]:
+    """Reduce a series to at most about `max_points` points using
+    min/max per bucket; short series are returned unchanged"""
+    if len(y) <= max_points:
+        return x, y
+    indices = minmax_indices(y, max(1, max_points // 2 - 1))
+    return x[indices], y[indices]
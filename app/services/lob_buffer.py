@@ -0,0 +1,132 @@
+import asyncio
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+from services.lob_decode import LOB_COLUMNS
+
+
+class LOBRingBuffer:
+    """Fixed-size window of LOB snapshots for one symbol.
+    event_time is kept as int64 nanoseconds, everything else as float64."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.event_time = np.zeros(capacity, dtype=np.int64)
+        self.columns = {col: np.full(capacity, np.nan) for col in LOB_COLUMNS}
+        self.size = 0
+        self._head = 0  # next write position
+        self.lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        return self.event_time.nbytes + sum(values.nbytes for values in self.columns.values())
+
+    @property
+    def last_event_time(self):
+        """Newest event_time in nanoseconds, None while empty"""
+        if not self.size:
+            return None
+        return int(self.event_time[self._head - 1])
+
+    def clear(self):
+        self.size = 0
+        self._head = 0
+
+    def append(self, event_time: np.ndarray, columns: dict) -> int:
+        """Append rows newer than the last seen event_time (input must be
+        sorted by event_time), evicting the oldest. Returns rows added."""
+        last = self.last_event_time
+        if last is not None:
+            start = int(np.searchsorted(event_time, last, side='right'))
+            event_time = event_time[start:]
+            columns = {col: values[start:] for col, values in columns.items()}
+
+        n = len(event_time)
+        if n == 0:
+            return 0
+        if n > self.capacity:
+            event_time = event_time[-self.capacity:]
+            columns = {col: values[-self.capacity:] for col, values in columns.items()}
+            n = self.capacity
+
+        positions = (self._head + np.arange(n)) % self.capacity
+        self.event_time[positions] = event_time
+        for col, buffer in self.columns.items():
+            values = columns.get(col)
+            buffer[positions] = np.nan if values is None else values
+
+        self._head = (self._head + n) % self.capacity
+        self.size = min(self.capacity, self.size + n)
+        return n
+
+    def _ordered(self, values: np.ndarray, limit: int) -> np.ndarray:
+        if self.size < self.capacity:
+            return values[max(0, self.size - limit):self.size]
+        ordered = np.concatenate((values[self._head:], values[:self._head]))
+        return ordered[self.size - limit:]
+
+    def to_frame(self, limit: int = None) -> 'pd.DataFrame':
+        """Chronologically ordered copy of the newest `limit` rows"""
+        import pandas as pd
+        limit = self.size if limit is None else min(limit, self.size)
+        data = {'event_time': self._ordered(self.event_time, limit).view('datetime64[ns]')}
+        for col, values in self.columns.items():
+            data[col] = self._ordered(values, limit)
+        return pd.DataFrame(data)
+
+
+class LOBBufferStore:
+    """Ring buffers for the most recently requested symbols, bounded by
+    both their number and the bytes they hold"""
+
+    def __init__(self, max_symbols: int = 200, max_bytes: int = 128 * 1024 * 1024):
+        self.max_symbols = max_symbols
+        self.max_bytes = max_bytes
+        self._buffers: OrderedDict[str, LOBRingBuffer] = OrderedDict()
+        self.nbytes = 0
+        self.evictions = 0
+        self.rows_fetched = 0
+        self.rows_appended = 0
+        self.full_fetches = 0
+        self.incremental_fetches = 0
+
+    def __len__(self) -> int:
+        return len(self._buffers)
+
+    def get(self, symbol: str, capacity: int) -> LOBRingBuffer:
+        """Buffer for symbol holding at least `capacity` rows.
+        A larger request replaces the buffer, which forces a full fetch."""
+        buffer = self._buffers.get(symbol)
+        if buffer is None or buffer.capacity < capacity:
+            if buffer is not None:
+                self.nbytes -= buffer.nbytes
+            buffer = LOBRingBuffer(capacity)
+            self._buffers[symbol] = buffer
+            self.nbytes += buffer.nbytes
+        self._buffers.move_to_end(symbol)
+        # The buffer just handed out stays even if it alone is over budget
+        while len(self._buffers) > 1 and (len(self._buffers) > self.max_symbols
+                                          or self.nbytes > self.max_bytes):
+            _, evicted = self._buffers.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+            self.evictions += 1
+        return buffer
+
+    def stats(self) -> dict:
+        return {
+            'symbols': len(self._buffers),
+            'bytes': self.nbytes,
+            'evictions': self.evictions,
+            'rows_fetched': self.rows_fetched,
+            'rows_appended': self.rows_appended,
+            'full_fetches': self.full_fetches,
+            'incremental_fetches': self.incremental_fetches,
+        }
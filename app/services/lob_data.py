@@ -1,63 +1,110 @@
-import pandas as pd
 import logging
 from typing import Optional
+
+import numpy as np
+
 from core.app_context import app_context
+from core.config import config
+from services.lob_decode import decode_lob_response, columns_to_frame
+from services.metrics import STAGE_SECONDS
 
 
 async def get_lob_depth(symbol: str, limit: int = 1000):
-    """Get LOB depth data for symbol"""
+    """Get LOB depth data for symbol, served from the shared TTL cache.
+    The returned DataFrame is shared between callers and must not be mutated."""
+    symbol = symbol.upper()
+    loader = load_lob_depth if app_context.lob_buffers is not None else fetch_lob_depth
+    with STAGE_SECONDS.time(stage='lob_data'):
+        if app_context.lob_cache is None:
+            return await loader(symbol, limit)
+        return await app_context.lob_cache.get_or_load(
+            (symbol, limit),
+            lambda: loader(symbol, limit)
+        )
+
+
+async def fetch_lob_depth(symbol: str, limit: int = 1000):
+    """Fetch the last `limit` LOB snapshots for symbol from the API"""
+    decoded = await fetch_lob_columns(symbol, {"limit": limit})
+    if decoded is None or not len(decoded[0]):
+        return None
+    return columns_to_frame(*decoded)
+
+
+async def load_lob_depth(symbol: str, limit: int = 1000):
+    """Serve LOB depth from the symbol's ring buffer, fetching only
+    snapshots newer than the last one already buffered. An empty buffer
+    is filled from the on-disk store when it holds `limit` rows, otherwise
+    fetched in full; new rows are added to the store."""
+    store = app_context.lob_buffers
+    disk = app_context.lob_store
+    buffer = store.get(symbol, limit)
+
+    async with buffer.lock:
+        stored = None
+        if not len(buffer) and disk is not None:
+            stored = await disk.read(symbol, limit=buffer.capacity)
+            # A short store is no substitute for the full fetch: the older
+            # rows asked for would never be requested
+            if stored is not None and len(stored[0]) >= buffer.capacity:
+                buffer.append(*stored)
+                stored = None
+
+        last = buffer.last_event_time
+        params = {"limit": buffer.capacity}
+        if last is not None:
+            params[config.LOB_API_SINCE_PARAM] = last / 1e9
+            store.incremental_fetches += 1
+        else:
+            store.full_fetches += 1
+
+        decoded = await fetch_lob_columns(symbol, params)
+        fetched = decoded is not None and len(decoded[0]) > 0
+        if stored is not None:
+            # Rows only the store still has go in front of the fetched ones
+            older = int(np.searchsorted(stored[0], decoded[0][0])) if fetched else len(stored[0])
+            buffer.append(stored[0][:older], {col: values[:older] for col, values in stored[1].items()})
+        if fetched:
+            event_time, columns = decoded
+            store.rows_fetched += len(event_time)
+            # A full page of only new rows means we may have missed some
+            truncated = len(event_time) >= buffer.capacity
+            if last is not None and truncated and event_time[0] > last:
+                buffer.clear()
+            store.rows_appended += buffer.append(event_time, columns)
+            if disk is not None:
+                new = slice(0 if last is None else int(np.searchsorted(event_time, last, side='right')), None)
+                covered_from = int(event_time[0]) if last is None or truncated else last
+                await disk.append(symbol, event_time[new],
+                                  {col: values[new] for col, values in columns.items()},
+                                  covered=(covered_from, int(event_time[-1]) + 1))
+
+        if not len(buffer):
+            return None
+        return buffer.to_frame(limit)
+
+
+async def fetch_lob_columns(symbol: str, params: dict) -> Optional[tuple]:
+    """Fetch LOB rows and decode them into (event_time, columns) arrays"""
     endpoint = f"/crypto/data/{symbol.upper()}"
-    params = {"limit": limit}
     
-    result = await app_context.api_client.get(endpoint, params=params)
+    result = await app_context.api_client.get_bytes(endpoint, params=params)
     
     if isinstance(result, dict) and 'error' in result:
         logging.error(f"Error getting LOB data for {symbol}: {result['error']}")
         return None
-    
-    if isinstance(result, dict) and 'data' in result:
-        data = result['data']
-    elif isinstance(result, list):
-        data = result
-    else:
-        logging.error(f"Unexpected response format: {type(result)}")
-        return None
-    
-    if not data:
-        logging.warning(f"No data returned for symbol {symbol}")
-        return None
-    
+
     try:
-        df = pd.DataFrame(data)
-        
-        # Convert UNIX timestamp to datetime - FIXED for FutureWarning
-        if 'event_time' in df.columns:
-            # First convert to numeric to handle string timestamps
-            df['event_time'] = pd.to_numeric(df['event_time'], errors='coerce')
-            # Then convert to datetime
-            df['event_time'] = pd.to_datetime(df['event_time'], unit='s')
-        
-        # Convert depth columns to numeric
-        depth_columns = [col for col in df.columns if 'depth' in col]
-        for col in depth_columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        # Convert other numeric columns
-        numeric_columns = ['best_bid', 'best_ask', 'min_bid', 'max_ask']
-        for col in numeric_columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        # Sort by timestamp if available
-        if 'event_time' in df.columns:
-            df = df.sort_values('event_time').reset_index(drop=True)
-        
-        return df
-        
+        with STAGE_SECONDS.time(stage='decode'):
+            decoded = decode_lob_response(result)
     except Exception as e:
         logging.exception(f"Error processing LOB data: {e}")
         return None
 
+    if decoded is not None and not len(decoded[0]):
+        logging.warning(f"No data returned for symbol {symbol}")
+    return decoded
+
 
 async def get_active_symbols() -> list:
     """Get list of active symbols"""
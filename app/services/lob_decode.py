@@ -0,0 +1,94 @@
+import io
+import logging
+from operator import itemgetter
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+import orjson
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+DEPTH_PCTS = (1, 3, 5, 8)
+PRICE_COLUMNS = ['best_bid', 'best_ask', 'min_bid', 'max_ask']
+DEPTH_COLUMNS = [f"depth_{pct}pct_{side}" for pct in DEPTH_PCTS for side in ('bid', 'ask')]
+LOB_COLUMNS = PRICE_COLUMNS + DEPTH_COLUMNS
+
+
+def _column(rows: list, name: str, getter=None) -> np.ndarray:
+    """Extract one field of every row as float64; bad values become NaN"""
+    getter = getter or (lambda row: row.get(name))
+    try:
+        return np.fromiter(map(getter, rows), dtype=np.float64, count=len(rows))
+    except (TypeError, ValueError, KeyError):
+        import pandas as pd
+        values = pd.Series([row.get(name) for row in rows], dtype=object)
+        return pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+
+
+def rows_to_columns(rows: list) -> tuple[np.ndarray, dict]:
+    """Convert API rows to int64 nanosecond event times and float64
+    LOB columns sorted by event_time. Rows without a time are dropped;
+    the sort is skipped when the rows already arrive in order."""
+    first = rows[0]
+    fields = [col for col in LOB_COLUMNS if col in first]
+    columns = {col: _column(rows, col, itemgetter(col)) for col in fields}
+    seconds = _column(rows, 'event_time', itemgetter('event_time'))
+
+    valid = ~np.isnan(seconds)
+    if not valid.all():
+        seconds = seconds[valid]
+        columns = {col: values[valid] for col, values in columns.items()}
+
+    if len(seconds) > 1 and not (seconds[1:] >= seconds[:-1]).all():
+        if (seconds[1:] <= seconds[:-1]).all():
+            # Newest-first responses only need reversing
+            order = slice(None, None, -1)
+        else:
+            order = np.argsort(seconds, kind='stable')
+        seconds = seconds[order]
+        columns = {col: values[order] for col, values in columns.items()}
+
+    event_time = (seconds * 1e9).astype(np.int64)
+    return event_time, columns
+
+
+def decode_lob_response(body: bytes) -> Optional[tuple[np.ndarray, dict]]:
+    """Parse a /crypto/data/{symbol} response body into typed columns.
+    Returns None for an unexpected payload, empty arrays for no rows."""
+    payload = orjson.loads(body)
+    if isinstance(payload, dict) and 'data' in payload:
+        rows = payload['data']
+    elif isinstance(payload, list):
+        rows = payload
+    else:
+        logging.error(f"Unexpected response format: {type(payload)}")
+        return None
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), {}
+    return rows_to_columns(rows)
+
+
+def columns_to_frame(event_time: np.ndarray, columns: dict) -> 'pd.DataFrame':
+    import pandas as pd
+    data = {'event_time': event_time.view('datetime64[ns]')}
+    for col in LOB_COLUMNS:
+        data[col] = columns.get(col, np.full(len(event_time), np.nan))
+    return pd.DataFrame(data)
+
+
+def frame_to_bytes(df: 'pd.DataFrame') -> bytes:
+    """Compact binary form of a LOB frame for the shared state backend"""
+    buffer = io.BytesIO()
+    arrays = {col: df[col].to_numpy() for col in LOB_COLUMNS if col in df.columns}
+    arrays['event_time'] = df['event_time'].to_numpy().view(np.int64)
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def frame_from_bytes(raw: bytes) -> 'pd.DataFrame':
+    with np.load(io.BytesIO(raw), allow_pickle=False) as arrays:
+        columns = {name: arrays[name] for name in arrays.files}
+    return columns_to_frame(columns.pop('event_time'), columns)
@@ -0,0 +1,163 @@
+import asyncio
+import html
+import warnings
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+from core.app_context import app_context
+from services.lob_decode import DEPTH_PCTS
+
+BID_COLUMNS = [f"depth_{pct}pct_bid" for pct in DEPTH_PCTS]
+ASK_COLUMNS = [f"depth_{pct}pct_ask" for pct in DEPTH_PCTS]
+
+
+def depth_imbalance(bids: np.ndarray, asks: np.ndarray) -> np.ndarray:
+    """(bid - ask) / (bid + ask) in percent; positive means bid-heavy"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (bids - asks) / (bids + asks) * 100
+
+
+def bid_ask_ratio(bids: np.ndarray, asks: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return bids / asks
+
+
+def spread_bps(best_bid: np.ndarray, best_ask: np.ndarray) -> np.ndarray:
+    """Spread relative to the mid price in basis points"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (best_ask - best_bid) / ((best_ask + best_bid) / 2) * 1e4
+
+
+def rolling_zscore(values: np.ndarray, window: int) -> np.ndarray:
+    """Z-score of each row against the trailing `window` rows, per
+    column, from cumulative sums in O(n). NaNs are skipped; rows with
+    fewer than two values in their window, or no variance, are NaN."""
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.isfinite(values)
+    filled = np.where(valid, values, 0.0)
+    n_valid = np.maximum(valid.sum(axis=0), 1)
+    # Centre each column first so the running sums keep their precision
+    centred = np.where(valid, filled - filled.sum(axis=0) / n_valid, 0.0)
+    column_var = (centred ** 2).sum(axis=0) / n_valid
+
+    def trailing(x):
+        total = np.cumsum(x, axis=0)
+        total[window:] = total[window:] - total[:-window]
+        return total
+
+    count = trailing(valid.astype(np.float64))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = trailing(centred) / count
+        var = trailing(centred ** 2) / count - mean ** 2
+        z = (centred - mean) / np.sqrt(var * count / (count - 1))
+    # Flat windows would turn rounding noise into huge scores
+    z[(count < 2) | ~valid | (var <= 1e-12 * column_var)] = np.nan
+    return z
+
+
+class LOBMetrics:
+    """Every derived series of one LOB dataset, computed in a single
+    vectorized pass. Depth metrics are (rows, len(DEPTH_PCTS)) arrays."""
+
+    def __init__(self, event_time: np.ndarray, best_bid: np.ndarray, best_ask: np.ndarray,
+                 bids: np.ndarray, asks: np.ndarray, window: int = 300):
+        self.event_time = event_time
+        self.window = window
+        self.best_bid = best_bid
+        self.best_ask = best_ask
+        self.bids = bids
+        self.asks = asks
+        self.mid = (best_bid + best_ask) / 2
+        self.spread_bps = spread_bps(best_bid, best_ask)
+        self.ratio = bid_ask_ratio(bids, asks)
+        self.imbalance = depth_imbalance(bids, asks)
+        z = rolling_zscore(np.hstack([bids, asks]), window)
+        self.bid_z, self.ask_z = z[:, :len(DEPTH_PCTS)], z[:, len(DEPTH_PCTS):]
+
+    @classmethod
+    def from_frame(cls, df: 'pd.DataFrame', window: int = 300) -> 'LOBMetrics':
+        def column(name):
+            return df[name].to_numpy(dtype=np.float64) if name in df else np.full(len(df), np.nan)
+
+        return cls(
+            df['event_time'].to_numpy().view(np.int64),
+            column('best_bid'), column('best_ask'),
+            np.column_stack([column(name) for name in BID_COLUMNS]),
+            np.column_stack([column(name) for name in ASK_COLUMNS]),
+            window
+        )
+
+    def __len__(self) -> int:
+        return len(self.event_time)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(value.nbytes for value in vars(self).values() if isinstance(value, np.ndarray))
+
+
+def data_version(symbol: str, df: 'pd.DataFrame') -> tuple:
+    """Identifies a dataset by its symbol, time span and size"""
+    event_time = df['event_time'].to_numpy().view(np.int64)
+    return (symbol, int(event_time[0]), int(event_time[-1]), len(df))
+
+
+async def get_lob_metrics(symbol: str, df: 'pd.DataFrame', window: int = 300) -> LOBMetrics:
+    """Metrics of df, computed once per data version and window"""
+    async def compute():
+        # Long ranges take seconds to crunch; keep the event loop free
+        return await asyncio.to_thread(LOBMetrics.from_frame, df, window)
+
+    cache = app_context.metrics_cache
+    if cache is None:
+        return await compute()
+    return await cache.get_or_load((*data_version(symbol, df), window), compute)
+
+
+def _fmt_volume(value: float) -> str:
+    if not np.isfinite(value):
+        return 'n/a'
+    for divisor, suffix in ((1e9, 'B'), (1e6, 'M'), (1e3, 'K')):
+        if abs(value) >= divisor:
+            return f"{value / divisor:.2f}{suffix}"
+    return f"{value:.0f}"
+
+
+def _fmt(value: float, spec: str) -> str:
+    return format(value, spec) if np.isfinite(value) else 'n/a'
+
+
+def format_lobstats(symbol: str, metrics: LOBMetrics) -> str:
+    """Latest values and window summary for an HTML <pre> block"""
+    first, last = metrics.event_time[0], metrics.event_time[-1]
+    span = np.datetime_as_string(np.array([first, last], dtype='datetime64[ns]'), unit='s')
+    mid, spread = metrics.mid, metrics.spread_bps
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        # All-NaN columns summarize as n/a
+        warnings.simplefilter('ignore', RuntimeWarning)
+        change = (mid[-1] / mid[0] - 1) * 100
+        mean_spread, max_spread = np.nanmean(spread), np.nanmax(spread)
+        mean_imbalance = np.nanmean(metrics.imbalance, axis=0)
+
+    lines = [
+        f"{symbol}, {len(metrics)} snapshots",
+        f"{span[0].replace('T', ' ')} - {span[1].replace('T', ' ')} UTC",
+        '',
+        f"mid     {_fmt(mid[-1], '.6g')} ({_fmt(change, '+.2f')}%)",
+        f"spread  {_fmt(spread[-1], '.2f')} bps "
+        f"(mean {_fmt(mean_spread, '.2f')}, max {_fmt(max_spread, '.2f')})",
+        '',
+        f"{'depth':<6}{'bid':>9}{'ask':>9}{'ratio':>7}{'imb%':>7}{'mean':>7}{'z bid':>7}{'z ask':>7}",
+    ]
+    for i, pct in enumerate(DEPTH_PCTS):
+        lines.append(
+            f"{f'{pct}%':<6}{_fmt_volume(metrics.bids[-1, i]):>9}{_fmt_volume(metrics.asks[-1, i]):>9}"
+            f"{_fmt(metrics.ratio[-1, i], '.2f'):>7}{_fmt(metrics.imbalance[-1, i], '+.1f'):>7}"
+            f"{_fmt(mean_imbalance[i], '+.1f'):>7}"
+            f"{_fmt(metrics.bid_z[-1, i], '+.1f'):>7}{_fmt(metrics.ask_z[-1, i], '+.1f'):>7}"
+        )
+    lines += ['', f"imb% = (bid - ask) / (bid + ask); z over the last {metrics.window} snapshots"]
+    return "<pre>" + html.escape("\n".join(lines)) + "</pre>"
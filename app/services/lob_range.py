@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+from core.app_context import app_context
+from core.config import config
+from services.lob_data import fetch_lob_columns
+from services.lob_decode import LOB_COLUMNS, columns_to_frame
+from services.metrics import STAGE_SECONDS
+
+
+class ColumnBuilder:
+    """Growable preallocated LOB columns filled from the end: pages are
+    fetched newest first and copied in front of the rows already there,
+    so only the output and the page being decoded are held in memory"""
+
+    def __init__(self, capacity: int = 0):
+        self.size = 0
+        self.event_time = np.empty(capacity, dtype=np.int64)
+        self.columns = {col: np.empty(capacity, dtype=np.float64) for col in LOB_COLUMNS}
+
+    @property
+    def capacity(self) -> int:
+        return len(self.event_time)
+
+    @property
+    def start(self) -> int:
+        return self.capacity - self.size
+
+    def reserve(self, capacity: int):
+        if capacity <= self.capacity:
+            return
+        start = self.start
+
+        def grow(values):
+            grown = np.empty(capacity, dtype=values.dtype)
+            grown[capacity - self.size:] = values[start:]
+            return grown
+
+        self.event_time = grow(self.event_time)
+        self.columns = {col: grow(values) for col, values in self.columns.items()}
+
+    def prepend(self, event_time: np.ndarray, columns: dict):
+        n = len(event_time)
+        if self.size + n > self.capacity:
+            self.reserve(max(self.size + n, 2 * self.capacity))
+        begin, end = self.start - n, self.start
+        self.event_time[begin:end] = event_time
+        for col, values in self.columns.items():
+            values[begin:end] = columns[col] if col in columns else np.nan
+        self.size += n
+
+    def to_frame(self):
+        return columns_to_frame(
+            self.event_time[self.start:],
+            {col: values[self.start:] for col, values in self.columns.items()}
+        )
+
+
+def split_windows(start: float, end: float, page_seconds: float) -> list[tuple[float, float]]:
+    """[start, end) in consecutive pages of at most page_seconds"""
+    edges = np.append(np.arange(start, end, page_seconds), end)
+    return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+
+async def fetch_window(symbol: str, start: float, end: float, row_limit: int,
+                       semaphore: asyncio.Semaphore) -> Optional[list[tuple]]:
+    """Snapshots with start <= event_time < end as a list of
+    (event_time, columns) pieces in time order. The API returns the
+    newest `row_limit` rows of a window, so when a page comes back full
+    its rows are kept and only the older remainder is requested next.
+    Every request holds `semaphore`. None when an API request failed."""
+    start_ns, end_ns = int(start * 1e9), int(end * 1e9)
+    pieces = []
+    while start_ns < end_ns:
+        async with semaphore:
+            decoded = await fetch_lob_columns(symbol, {
+                config.LOB_API_SINCE_PARAM: start_ns / 1e9,
+                # A hair past the bound: rows at or after end_ns are cut below
+                config.LOB_API_UNTIL_PARAM: end_ns / 1e9 + 1e-6,
+                "limit": row_limit,
+            })
+        if decoded is None:
+            return None
+
+        event_time, columns = decoded
+        full = len(event_time) >= row_limit
+        keep = (event_time >= start_ns) & (event_time < end_ns)
+        if not keep.all():
+            event_time = event_time[keep]
+            columns = {col: values[keep] for col, values in columns.items()}
+        if not len(event_time):
+            break
+        pieces.append((event_time, columns))
+        if not full:
+            break
+        end_ns = int(event_time[0])
+    return pieces[::-1]
+
+
+async def fetch_pages(symbol: str, windows: list[tuple[float, float]], consume,
+                      concurrency: int = 4, row_limit: int = 20000, fetch=None) -> tuple[int, int]:
+    """Fetch time windows with at most `concurrency` requests ahead of
+    the page being consumed, handing each page's pieces to
+    `await consume(window, pieces)` in the order of `windows`; a False return
+    stops early. `await fetch(window, semaphore)` can stand in for the API
+    request of a window. Cancelling the caller cancels every request in
+    flight. Returns (pages failed, pages consumed)."""
+    remaining = iter(windows)
+    pending: deque[tuple[tuple, asyncio.Task]] = deque()
+    # Shared by every API request, including the follow-ups of full pages
+    semaphore = asyncio.Semaphore(concurrency)
+    failed = done = 0
+    if fetch is None:
+        async def fetch(window, semaphore):
+            return await fetch_window(symbol, *window, row_limit, semaphore)
+
+    def launch():
+        window = next(remaining, None)
+        if window is not None:
+            pending.append((window, asyncio.create_task(fetch(window, semaphore))))
+
+    try:
+        for _ in range(concurrency):
+            launch()
+        while pending:
+            window, task = pending.popleft()
+            pieces = await task
+            done += 1
+            launch()
+            if pieces is None:
+                failed += 1
+            elif await consume(window, pieces) is False:
+                break
+    finally:
+        for _, task in pending:
+            task.cancel()
+        await asyncio.gather(*[task for _, task in pending], return_exceptions=True)
+    return failed, done
+
+
+def collect(builder: ColumnBuilder, window: tuple[float, float], pieces: list[tuple],
+            seconds: float, max_rows: int) -> bool:
+    """Copy a window's pieces in front of the rows in `builder`, keeping
+    at most max_rows in all; False once it is full. `seconds` is the
+    length of the whole range, used to size the output."""
+    for event_time, columns in reversed(pieces):
+        if not builder.capacity and len(event_time):
+            # Size the output after the first window's density
+            density = len(event_time) / max(window[1] - window[0], 1e-9)
+            builder.reserve(min(max_rows, int(density * seconds * 1.1) + 1))
+        keep = slice(max(0, len(event_time) - (max_rows - builder.size)), None)
+        builder.prepend(event_time[keep], {col: values[keep] for col, values in columns.items()})
+    return builder.size < max_rows
+
+
+async def fetch_lob_range(symbol: str, start: float, end: float,
+                          page_seconds: float = 3600.0, concurrency: int = 4,
+                          row_limit: int = 20000, max_rows: int = 1_000_000):
+    """Fetch [start, end) (unix seconds) in time-window pages, newest
+    first. Past max_rows the oldest pages are left out. Returns (frame
+    or None, number of pages that failed)."""
+    pages = split_windows(start, end, page_seconds)[::-1]
+    builder = ColumnBuilder()
+
+    async def consume(window, pieces):
+        return collect(builder, window, pieces, end - start, max_rows)
+
+    failed, done = await fetch_pages(symbol, pages, consume, concurrency, row_limit)
+    if builder.size >= max_rows and done < len(pages):
+        logging.warning(f"{symbol} range capped at {max_rows} rows after {done}/{len(pages)} pages")
+
+    if not builder.size:
+        return None, failed
+    return builder.to_frame(), failed
+
+
+async def load_lob_range(symbol: str, start: float, end: float,
+                         page_seconds: float = 3600.0, concurrency: int = 4,
+                         row_limit: int = 20000, max_rows: int = 1_000_000):
+    """Like fetch_lob_range, but read through the on-disk store: spans of
+    [start, end) fetched before are read from disk, only the rest is
+    requested, and fetched pages go into the store as they arrive"""
+    store = app_context.lob_store
+    start_ns, end_ns = int(start * 1e9), int(end * 1e9)
+    gaps = await store.missing(symbol, start_ns, end_ns)
+
+    # Stored spans are read whole, gaps are fetched in pages
+    windows, stored = [], set()
+    position = start_ns
+    for gap_start, gap_end in [*gaps, (end_ns, end_ns)]:
+        if position < gap_start:
+            windows.append((position / 1e9, gap_start / 1e9))
+            stored.add(windows[-1])
+        windows += split_windows(gap_start / 1e9, gap_end / 1e9, page_seconds)
+        position = gap_end
+    windows.reverse()
+    builder = ColumnBuilder()
+
+    async def fetch(window, semaphore):
+        window_ns = (int(window[0] * 1e9), int(window[1] * 1e9))
+        if window in stored:
+            decoded = await store.read(symbol, *window_ns, limit=max_rows)
+            return [decoded] if decoded is not None else []
+        pieces = await fetch_window(symbol, *window, row_limit, semaphore)
+        if pieces is not None:
+            for event_time, columns in pieces:
+                await store.append(symbol, event_time, columns)
+            await store.append(symbol, np.empty(0, dtype=np.int64), {}, covered=window_ns)
+        return pieces
+
+    async def consume(window, pieces):
+        return collect(builder, window, pieces, end - start, max_rows)
+
+    failed, done = await fetch_pages(symbol, windows, consume, concurrency, row_limit, fetch)
+    if builder.size >= max_rows and done < len(windows):
+        logging.warning(f"{symbol} range capped at {max_rows} rows after {done}/{len(windows)} pages")
+
+    if not builder.size:
+        return None, failed
+    return builder.to_frame(), failed
+
+
+async def get_lob_range(symbol: str, seconds: float):
+    """LOB snapshots of the last `seconds` for symbol as (DataFrame or
+    None, failed pages). Complete ranges are cached for a short while;
+    there is no single-flight loading so that a cancelled request stops
+    its fetches instead of leaving them to another caller."""
+    symbol = symbol.upper()
+    cache = app_context.range_cache
+    key = (symbol, seconds)
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        return cached, 0
+
+    end = time.time()
+    loader = load_lob_range if app_context.lob_store is not None else fetch_lob_range
+    with STAGE_SECONDS.time(stage='lob_range'):
+        data, failed = await loader(
+            symbol, end - seconds, end,
+            page_seconds=config.LOB_RANGE_PAGE_SECONDS,
+            concurrency=config.LOB_RANGE_CONCURRENCY,
+            row_limit=config.LOB_MAX_LIMIT,
+            max_rows=config.LOB_RANGE_MAX_ROWS,
+        )
+    if cache is not None and data is not None and not failed:
+        cache.set(key, data)
+    return data, failed
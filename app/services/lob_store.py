@@ -0,0 +1,402 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import shutil
+import time
+from typing import Optional
+
+import numpy as np
+
+from services.lob_decode import LOB_COLUMNS
+
+
+MANIFEST = 'manifest.json'
+ARRAYS = ['event_time', *LOB_COLUMNS]
+
+
+def add_interval(intervals: list[tuple[int, int]], start: int, end: int) -> list[tuple[int, int]]:
+    """Sorted, merged [start, end) intervals with one more added"""
+    merged = []
+    for a, b in sorted([*intervals, (start, end)]):
+        if merged and a <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], b))
+        else:
+            merged.append((a, b))
+    return merged
+
+
+def missing_intervals(intervals: list[tuple[int, int]], start: int, end: int,
+                      min_gap: int = 0) -> list[tuple[int, int]]:
+    """Parts of [start, end) not covered by the sorted intervals"""
+    gaps = []
+    for a, b in intervals:
+        if b <= start:
+            continue
+        if a >= end:
+            break
+        if a - start > min_gap:
+            gaps.append((start, a))
+        start = max(start, b)
+    if end - start > min_gap:
+        gaps.append((start, end))
+    return gaps
+
+
+def slice_rows(event_time: np.ndarray, columns: dict, start: Optional[int] = None,
+               end: Optional[int] = None, limit: Optional[int] = None) -> tuple:
+    """Views of the rows with start <= event_time < end, at most the
+    newest `limit`; no data is copied"""
+    lo = 0 if start is None else int(np.searchsorted(event_time, start, side='left'))
+    hi = len(event_time) if end is None else int(np.searchsorted(event_time, end, side='left'))
+    if limit is not None:
+        lo = max(lo, hi - limit)
+    return event_time[lo:hi], {col: values[lo:hi] for col, values in columns.items()}
+
+
+def merge_rows(pieces: list[tuple]) -> tuple:
+    """Concatenate (event_time, columns) pieces into one time-ordered run.
+    Where pieces overlap the row from the later piece wins."""
+    if len(pieces) == 1:
+        return pieces[0]
+    event_time = np.concatenate([piece[0] for piece in pieces])
+    columns = {col: np.concatenate([piece[1][col] for piece in pieces]) for col in LOB_COLUMNS}
+    if len(event_time) > 1 and not (np.diff(event_time) > 0).all():
+        order = np.argsort(event_time, kind='stable')
+        event_time = event_time[order]
+        keep = np.append(event_time[1:] != event_time[:-1], True)
+        order, event_time = order[keep], event_time[keep]
+        columns = {col: values[order] for col, values in columns.items()}
+    return event_time, columns
+
+
+class Segment:
+    """Immutable run of snapshots sorted by event_time, stored as one
+    .npy file per column and memory-mapped on first read"""
+
+    def __init__(self, path: str, rows: int, first: int, last: int):
+        self.path = path
+        self.rows = rows
+        self.first = first
+        self.last = last
+        self._arrays = None
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    def arrays(self) -> tuple:
+        """(event_time, columns) as read-only memory maps"""
+        if self._arrays is None:
+            loaded = {}
+            for name in ARRAYS:
+                file = os.path.join(self.path, f"{name}.npy")
+                loaded[name] = (np.load(file, mmap_mode='r') if os.path.exists(file)
+                                else np.full(self.rows, np.nan))
+            self._arrays = (loaded.pop('event_time'), loaded)
+        return self._arrays
+
+    def to_dict(self) -> dict:
+        return {'name': self.name, 'rows': self.rows, 'first': self.first, 'last': self.last}
+
+    @staticmethod
+    def write(path: str, event_time: np.ndarray, columns: dict):
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        np.save(os.path.join(tmp_path, 'event_time.npy'), event_time)
+        for col, values in columns.items():
+            np.save(os.path.join(tmp_path, f"{col}.npy"), values)
+        os.rename(tmp_path, path)
+
+
+class SymbolStore:
+    """Segments, covered time intervals and rows not yet written for one symbol"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.segments: list[Segment] = []
+        # [start, end) ns intervals fully fetched from the API
+        self.covered: list[tuple[int, int]] = []
+        self.pending: list[tuple] = []
+        self.pending_covered: list[tuple[int, int]] = []
+        self.pending_rows = 0
+        self.next_id = 0
+        self.loaded = False
+        self.lock = asyncio.Lock()
+
+    @property
+    def last_event_time(self) -> Optional[int]:
+        times = [segment.last for segment in self.segments]
+        times += [int(piece[0][-1]) for piece in self.pending]
+        return max(times, default=None)
+
+    def all_covered(self) -> list[tuple[int, int]]:
+        covered = self.covered
+        for start, end in self.pending_covered:
+            covered = add_interval(covered, start, end)
+        return covered
+
+    def load(self):
+        try:
+            with open(os.path.join(self.path, MANIFEST)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        self.next_id = manifest.get('next_id', 0)
+        self.covered = [tuple(interval) for interval in manifest.get('covered', [])]
+        self.segments = [
+            Segment(os.path.join(self.path, item['name']), item['rows'], item['first'], item['last'])
+            for item in manifest.get('segments', [])
+        ]
+        # Segments written but never committed to the manifest
+        listed = {segment.name for segment in self.segments}
+        if os.path.isdir(self.path):
+            for entry in os.listdir(self.path):
+                if entry != MANIFEST and entry not in listed:
+                    shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+
+    def manifest(self) -> dict:
+        return {
+            'next_id': self.next_id,
+            'segments': [segment.to_dict() for segment in self.segments],
+            'covered': [list(interval) for interval in self.covered],
+        }
+
+    def write_manifest(self, manifest: dict):
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = os.path.join(self.path, f"{MANIFEST}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST))
+
+    def new_segment_path(self) -> str:
+        self.next_id += 1
+        return os.path.join(self.path, f"{self.next_id:08d}")
+
+
+class LOBStore:
+    """On-disk per-symbol store of every LOB snapshot the bot fetched.
+
+    New rows are kept in memory and written as an immutable segment of
+    memory-mapped .npy columns once `segment_rows` accumulate or every
+    `flush_interval` seconds. Reads slice the segments by time without
+    copying. Segments are merged size-tiered: tier k holds segments of
+    max_segments**k to max_segments**(k+1) rows, and once a tier has
+    `max_segments` of them they are merged into one segment of the next
+    tier, so each row is rewritten a logarithmic number of times.
+    Segments of `compact_rows` or more are left alone, and rows older
+    than `retention_days` are dropped. The time intervals known to be complete are recorded,
+    so callers can fetch only what is missing; the last `ingest_lag`
+    seconds never count as complete, since the upstream API may still
+    add snapshots there."""
+
+    def __init__(self, root: str, segment_rows: int = 50_000, max_segments: int = 8,
+                 compact_rows: int = 1_000_000, retention_days: float = 30.0,
+                 flush_interval: float = 60.0, ingest_lag: float = 60.0):
+        self.root = root
+        self.segment_rows = segment_rows
+        self.max_segments = max(2, max_segments)
+        self.compact_rows = compact_rows
+        self.retention_days = retention_days
+        self.flush_interval = flush_interval
+        self.ingest_lag = ingest_lag
+        self._symbols: dict[str, SymbolStore] = {}
+        self._flushes: dict[str, asyncio.Task] = {}
+        self._task = None
+        self.rows_written = 0
+        self.segments_written = 0
+        self.compactions = 0
+        self.reads = 0
+
+    async def symbol(self, symbol: str) -> SymbolStore:
+        """The symbol's store, its manifest loaded off the event loop on first use"""
+        store = self._symbols.get(symbol)
+        if store is None:
+            store = SymbolStore(os.path.join(self.root, symbol))
+            self._symbols[symbol] = store
+        if not store.loaded:
+            async with store.lock:
+                if not store.loaded:
+                    try:
+                        await asyncio.to_thread(store.load)
+                    except Exception as e:
+                        logging.error(f"Could not load LOB store for {symbol}: {e}")
+                    store.loaded = True
+        return store
+
+    async def last_event_time(self, symbol: str) -> Optional[int]:
+        return (await self.symbol(symbol)).last_event_time
+
+    async def missing(self, symbol: str, start: int, end: int) -> list[tuple[int, int]]:
+        """Parts of [start, end) ns that were never fetched, ignoring
+        sub-millisecond slivers left by float rounding"""
+        store = await self.symbol(symbol)
+        return missing_intervals(store.all_covered(), start, end, min_gap=1_000_000)
+
+    async def append(self, symbol: str, event_time: np.ndarray, columns: dict,
+                     covered: Optional[tuple[int, int]] = None):
+        """Add rows sorted by event_time; `covered` marks the [start, end)
+        ns interval they completely describe"""
+        store = await self.symbol(symbol)
+        if len(event_time):
+            columns = {col: columns[col] if col in columns else np.full(len(event_time), np.nan)
+                       for col in LOB_COLUMNS}
+            store.pending.append((event_time, columns))
+            store.pending_rows += len(event_time)
+        if covered is not None:
+            start, end = covered[0], min(covered[1], time.time_ns() - int(self.ingest_lag * 1e9))
+            if start < end:
+                store.pending_covered.append((start, end))
+        flushing = self._flushes.get(symbol)
+        if store.pending_rows >= self.segment_rows and (flushing is None or flushing.done()):
+            self._flushes[symbol] = asyncio.create_task(self.flush(symbol))
+
+    async def read(self, symbol: str, start: Optional[int] = None, end: Optional[int] = None,
+                   limit: Optional[int] = None) -> Optional[tuple]:
+        """(event_time, columns) with start <= event_time < end, at most the
+        newest `limit` rows. A range inside one segment comes back as
+        read-only views of the memory maps; None when there are no rows.
+        Runs in a thread, holding the symbol's lock so no segment it
+        reads is compacted away meanwhile."""
+        store = await self.symbol(symbol)
+        self.reads += 1
+        async with store.lock:
+            return await asyncio.to_thread(self._read, store, start, end, limit)
+
+    @staticmethod
+    def _read(store: SymbolStore, start: Optional[int], end: Optional[int],
+              limit: Optional[int]) -> Optional[tuple]:
+        pieces = [segment.arrays() for segment in store.segments
+                  if (start is None or segment.last >= start) and (end is None or segment.first < end)]
+        pieces += list(store.pending)
+        pieces = [slice_rows(*piece, start, end, limit) for piece in pieces]
+        pieces = sorted((piece for piece in pieces if len(piece[0])), key=lambda piece: piece[0][0])
+        if not pieces:
+            return None
+        event_time, columns = merge_rows(pieces)
+        if limit is not None and len(event_time) > limit:
+            event_time, columns = slice_rows(event_time, columns, limit=limit)
+        return event_time, columns
+
+    async def flush(self, symbol: Optional[str] = None):
+        """Write pending rows as new segments (all symbols by default)"""
+        for name in [symbol] if symbol else list(self._symbols):
+            try:
+                await self._flush(await self.symbol(name))
+            except Exception as e:
+                logging.exception(f"Could not flush LOB store for {name}: {e}")
+
+    async def _flush(self, store: SymbolStore):
+        async with store.lock:
+            pieces, covered = list(store.pending), list(store.pending_covered)
+            if not pieces and not covered:
+                return
+            segments = store.segments
+            if pieces:
+                event_time, columns = await asyncio.to_thread(merge_rows, pieces)
+                segment = Segment(store.new_segment_path(), len(event_time),
+                                  int(event_time[0]), int(event_time[-1]))
+                await asyncio.to_thread(Segment.write, segment.path, event_time, columns)
+                segments = sorted([*segments, segment], key=lambda s: s.first)
+                self.rows_written += segment.rows
+                self.segments_written += 1
+
+            # Swap in the segment and drop what it holds from pending in one step
+            store.segments = segments
+            del store.pending[:len(pieces)]
+            del store.pending_covered[:len(covered)]
+            store.pending_rows = sum(len(piece[0]) for piece in store.pending)
+            for start, end in covered:
+                store.covered = add_interval(store.covered, start, end)
+
+            await self._compact(store)
+
+    def _tier(self, segment: Segment) -> int:
+        return int(math.log(max(segment.rows, 1), self.max_segments))
+
+    def _merge_group(self, segments: list[Segment]) -> list[Segment]:
+        """Segments of the smallest size tier that has filled up, or []"""
+        tiers: dict[int, list[Segment]] = {}
+        for segment in segments:
+            if segment.rows < self.compact_rows:
+                tiers.setdefault(self._tier(segment), []).append(segment)
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= self.max_segments:
+                return tiers[tier]
+        return []
+
+    async def _merge(self, store: SymbolStore, segments: list[Segment],
+                     cutoff: int) -> Optional[Segment]:
+        def merge():
+            pieces = sorted((segment.arrays() for segment in segments), key=lambda piece: piece[0][0])
+            event_time, columns = merge_rows(pieces)
+            return slice_rows(event_time, columns, start=cutoff)
+
+        event_time, columns = await asyncio.to_thread(merge)
+        if not len(event_time):
+            return None
+        merged = Segment(store.new_segment_path(), len(event_time),
+                         int(event_time[0]), int(event_time[-1]))
+        await asyncio.to_thread(Segment.write, merged.path, event_time, columns)
+        return merged
+
+    async def _compact(self, store: SymbolStore):
+        """Drop expired segments, merge size tiers that have filled up
+        and write the manifest"""
+        cutoff = time.time_ns() - int(self.retention_days * 86400e9)
+        removed = [segment for segment in store.segments if segment.last < cutoff]
+        live = [segment for segment in store.segments if segment.last >= cutoff]
+        while group := self._merge_group(live):
+            merged = await self._merge(store, group, cutoff)
+            live = [segment for segment in live if segment not in group] + ([merged] if merged else [])
+            removed += group
+
+        store.segments = sorted(live, key=lambda segment: segment.first)
+        if removed:
+            store.covered = [(max(a, cutoff), b) for a, b in store.covered if b > cutoff]
+        await asyncio.to_thread(store.write_manifest, store.manifest())
+
+        # Open memory maps keep the data of removed files readable
+        for segment in removed:
+            await asyncio.to_thread(shutil.rmtree, segment.path, True)
+        if removed:
+            self.compactions += 1
+
+    async def compact(self, symbol: str):
+        store = await self.symbol(symbol)
+        async with store.lock:
+            await self._compact(store)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.gather(*self._flushes.values(), return_exceptions=True)
+        self._flushes.clear()
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            'symbols': len(self._symbols),
+            'segments': sum(len(store.segments) for store in self._symbols.values()),
+            'pending_rows': sum(store.pending_rows for store in self._symbols.values()),
+            'rows_written': self.rows_written,
+            'segments_written': self.segments_written,
+            'compactions': self.compactions,
+            'reads': self.reads,
+        }
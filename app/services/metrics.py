@@ -0,0 +1,205 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels_text(labelnames: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def expose(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def values(self) -> dict[tuple, float]:
+        return dict(self._values)
+
+    def expose(self) -> list[str]:
+        lines = super().expose()
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_labels_text(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def expose(self) -> list[str]:
+        lines = super().expose()
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_labels_text(self.labelnames, key)} {value}")
+        return lines
+
+
+class _Series:
+    def __init__(self, buckets: tuple, window: int):
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+
+class Histogram(_Metric):
+    """Prometheus histogram that also keeps a window of recent samples
+    for exact percentiles in /stats"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (),
+                 buckets: tuple = DEFAULT_BUCKETS, window: int = 2048):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+        self.window = window
+        self._series: dict[tuple, _Series] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(self.buckets, self.window)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series.counts[i] += 1
+        series.sum += value
+        series.count += 1
+        series.recent.append(value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def percentiles(self, quantiles=(0.5, 0.95, 0.99)) -> dict[tuple, dict]:
+        """{label values: {'count': n, 0.5: p50, ...}} over recent samples"""
+        result = {}
+        for key, series in self._series.items():
+            samples = sorted(series.recent)
+            if not samples:
+                continue
+            row = {'count': series.count}
+            for q in quantiles:
+                row[q] = samples[min(len(samples) - 1, int(q * len(samples)))]
+            result[key] = row
+        return result
+
+    def expose(self) -> list[str]:
+        lines = super().expose()
+        for key, series in self._series.items():
+            for bound, count in zip(self.buckets, series.counts):
+                labels = _labels_text(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _labels_text(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {series.count}")
+            labels = _labels_text(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {series.sum}")
+            lines.append(f"{self.name}_count{labels} {series.count}")
+        return lines
+
+
+REGISTRY: list[_Metric] = []
+_collectors: list[Callable[[], None]] = []
+
+
+def register_collector(collect: Callable[[], None]):
+    """Callback run before every scrape, e.g. to copy component stats into gauges"""
+    _collectors.append(collect)
+
+
+def render_prometheus() -> str:
+    for collect in _collectors:
+        collect()
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.expose())
+    return '\n'.join(lines) + '\n'
+
+
+# Hot path of a chart request
+STAGE_SECONDS = Histogram(
+    'lob_stage_seconds', 'Time spent per request stage', ['stage']
+)
+API_RESPONSES = Counter(
+    'lob_api_responses_total', 'LOB API responses by HTTP status', ['status']
+)
+EVENT_LOOP_LAG = Histogram(
+    'lob_event_loop_lag_seconds', 'Delay of event loop wake-ups',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+COMPONENT_STATS = Gauge(
+    'lob_component_stat', 'Counters and gauges reported by bot components',
+    ['component', 'stat']
+)
+
+
+def register_component(name: str, stats: Callable[[], dict]):
+    """Expose a component's stats() dict as lob_component_stat gauges"""
+    def collect():
+        for stat, value in stats().items():
+            COMPONENT_STATS.set(float(value), component=name, stat=stat)
+    register_collector(collect)
+
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    """Sleep for `interval` in a loop and record how late each wake-up is"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - started - interval))
+
+
+async def handle_metrics(request):
+    from aiohttp import web
+    return web.Response(text=render_prometheus(), content_type='text/plain', charset='utf-8')
+
+
+async def start_metrics_server(host: str, port: int):
+    """Standalone /metrics endpoint (polling mode); returns the runner"""
+    from aiohttp import web
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -1,46 +1,81 @@
-import os
 import logging
-import asyncio
-from aiogram import Bot
-from aiogram.types import FSInputFile
-from core.config import config
+from aiogram.types import BufferedInputFile, InputMediaPhoto
 from core.app_context import app_context
+from services.metrics import STAGE_SECONDS
 
-# load bot
-# bot = Bot(token=config.tg_bot.token)
 
+def as_photo(image: bytes | str, filename: str = "chart.png"):
+    """PNG bytes are uploaded, a str is resent as a Telegram file_id"""
+    if isinstance(image, str):
+        return image
+    return BufferedInputFile(image, filename=filename)
 
-async def send_image(chat_id, image_filename, msg):    
-    if not os.path.exists(image_filename):
-        logging.error(f"File {filename} not found!")
+
+def photo_file_id(message) -> str | None:
+    """file_id of the largest size of a sent photo"""
+    if message is None or not message.photo:
+        return None
+    return message.photo[-1].file_id
+
+
+async def deliver(chat_id, request, weight: int = 1, stage: str = 'send'):
+    """Send one Bot API request through the outbound rate scheduler"""
+    async def timed_request():
+        with STAGE_SECONDS.time(stage=stage):
+            return await request()
+
+    if app_context.outbound is None:
+        return await timed_request()
+    return await app_context.outbound.send(chat_id, timed_request, weight=weight)
+
+
+async def send_image(chat_id, image: bytes | str, msg, filename: str = "chart.png", **kwargs):
+    if not image:
+        logging.error("Empty image, nothing to send")
         await send_msg(chat_id, "Ошибка: изображение не сгенерировано.")
         return
-    try:
-        # image_path = os.path.join(tgbot_dir, image_filename)
-        # photo = FSInputFile(image_path)
-        photo = FSInputFile(image_filename)
-        await app_context.bot.send_photo(
-            chat_id=chat_id,
-            photo=photo,
-            caption=msg,
-            request_timeout=30  # Увеличиваем таймаут
-        )        
-    except Exception as e:
-        logging.error(f"Send image error: {e}")
-        await asyncio.sleep(5)
-        await app_context.bot.send_photo(chat_id=chat_id, photo=photo, caption=msg)
-    finally:
-        os.remove(image_filename)
-
-
-async def send_msg(chat_id, msg):
-    try:
-        await app_context.bot.send_message(
-            chat_id=chat_id,
-            text=str(msg),
-            request_timeout=15
+    photo = as_photo(image, filename)
+    return await deliver(chat_id, lambda: app_context.bot.send_photo(
+        chat_id=chat_id,
+        photo=photo,
+        caption=msg,
+        request_timeout=30,  # Увеличиваем таймаут
+        **kwargs
+    ), stage='upload')
+
+
+async def edit_image(chat_id, message_id: int, image: bytes | str, caption: str,
+                     filename: str = "chart.png", **kwargs):
+    """Replace the photo and caption of a sent message in place"""
+    return await deliver(chat_id, lambda: app_context.bot.edit_message_media(
+        chat_id=chat_id,
+        message_id=message_id,
+        media=InputMediaPhoto(media=as_photo(image, filename), caption=caption),
+        request_timeout=30,
+        **kwargs
+    ), stage='upload')
+
+
+async def send_media_group(chat_id, images: list[tuple[bytes | str, str]], caption: str):
+    """Send several PNG images or file_ids as one album, caption on the first item"""
+    media = [
+        InputMediaPhoto(
+            media=as_photo(image, filename),
+            caption=caption if i == 0 else None
         )
-    except Exception as e:
-        logging.error(f"Send message error: {e}")
-        await asyncio.sleep(3)
-        await app_context.bot.send_message(chat_id=chat_id, text=str(msg))
\ No newline at end of file
+        for i, (image, filename) in enumerate(images)
+    ]
+    return await deliver(chat_id, lambda: app_context.bot.send_media_group(
+        chat_id=chat_id,
+        media=media,
+        request_timeout=60
+    ), weight=len(media), stage='upload')
+
+
+async def send_msg(chat_id, msg, **kwargs):
+    return await deliver(chat_id, lambda: app_context.bot.send_message(
+        chat_id=chat_id,
+        text=str(msg),
+        request_timeout=15,
+        **kwargs
+    ))
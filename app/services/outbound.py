@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable
+
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+
+class OutboundDropped(RuntimeError):
+    """Raised when a request is dropped because the outbound queue is full"""
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        # `updated` lies in the future while paused
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def pause(self, seconds: float):
+        """Hand out nothing for `seconds`, then refill from empty"""
+        self._refill()
+        self.tokens = 0.0
+        self.updated = max(self.updated, time.monotonic() + seconds)
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until `tokens` are available and take them"""
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < tokens:
+                paused = max(0.0, self.updated - time.monotonic())
+                await asyncio.sleep(paused + (tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
+
+
+class _ChatState:
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class OutboundScheduler:
+    """Single path for every outgoing Telegram request.
+
+    Requests for one chat are sent in submission order and paced by a
+    per-chat token bucket; all chats share one global bucket. Flood
+    control (TelegramRetryAfter) pauses both the chat and the global
+    bucket for the requested time, since the limit may be the bot's as a
+    whole; network and server errors are retried with backoff,
+    and requests beyond `max_pending` are dropped with OutboundDropped."""
+
+    def __init__(self, global_rate: float = 30.0, chat_rate: float = 1.0,
+                 chat_burst: float = 3.0, max_pending: int = 1000,
+                 max_attempts: int = 3, max_chats: int = 10000):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.max_chats = max_chats
+        self._chats: OrderedDict[Any, _ChatState] = OrderedDict()
+        self.pending = 0
+        self.sent = 0
+        self.retries = 0
+        self.retry_after_waits = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue_latency = deque(maxlen=1000)
+
+    def _chat(self, chat_id) -> _ChatState:
+        state = self._chats.get(chat_id)
+        if state is None:
+            state = _ChatState(TokenBucket(self.chat_rate, self.chat_burst))
+            self._chats[chat_id] = state
+            # Forget the least recently used idle chats
+            if len(self._chats) > self.max_chats:
+                for old_id in list(self._chats)[:len(self._chats) - self.max_chats]:
+                    if self._chats[old_id].users == 0:
+                        del self._chats[old_id]
+        self._chats.move_to_end(chat_id)
+        return state
+
+    async def send(self, chat_id, request: Callable[[], Awaitable[Any]], weight: int = 1) -> Any:
+        """Run `request()` (one Bot API call) under the rate limits.
+        `weight` is the number of messages it produces, e.g. album size.
+        Raises OutboundDropped when the queue is full."""
+        if self.pending >= self.max_pending:
+            self.dropped += 1
+            logging.warning(f"Outbound queue full ({self.pending}), dropping message to {chat_id}")
+            raise OutboundDropped(f"Outbound queue is full ({self.pending} pending)")
+
+        self.pending += 1
+        chat = self._chat(chat_id)
+        chat.users += 1
+        enqueued = time.monotonic()
+        try:
+            async with chat.lock:
+                for attempt in range(1, self.max_attempts + 1):
+                    await chat.bucket.acquire(weight)
+                    await self.global_bucket.acquire(weight)
+                    if attempt == 1:
+                        self._queue_latency.append(time.monotonic() - enqueued)
+                    try:
+                        result = await request()
+                        self.sent += 1
+                        return result
+                    except TelegramRetryAfter as e:
+                        self.retry_after_waits += 1
+                        logging.warning(f"Flood control for {chat_id}: retry after {e.retry_after}s")
+                        error = e
+                        self.global_bucket.pause(e.retry_after)
+                        if attempt < self.max_attempts:
+                            await asyncio.sleep(e.retry_after)
+                    except (TelegramNetworkError, TelegramServerError) as e:
+                        logging.warning(f"Send to {chat_id} failed (attempt {attempt}): {e}")
+                        error = e
+                        if attempt < self.max_attempts:
+                            await asyncio.sleep(2 ** attempt)
+                    if attempt < self.max_attempts:
+                        self.retries += 1
+                self.failed += 1
+                raise error
+        finally:
+            chat.users -= 1
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        latency = sorted(self._queue_latency)
+        return {
+            'pending': self.pending,
+            'chats': len(self._chats),
+            'sent': self.sent,
+            'retries': self.retries,
+            'retry_after_waits': self.retry_after_waits,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'avg_queue_latency_sec': sum(latency) / len(latency) if latency else 0.0,
+            'p95_queue_latency_sec': latency[int(len(latency) * 0.95)] if latency else 0.0,
+        }
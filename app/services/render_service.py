@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from multiprocessing import get_all_start_methods, get_context
+
+from services.metrics import STAGE_SECONDS
+
+
+class RenderQueueFull(RuntimeError):
+    """Raised when the render queue is at capacity"""
+
+
+def _init_worker():
+    """Draw a throwaway chart once per worker process"""
+    from services.charts import warm_up
+    warm_up()
+
+
+def _mp_context():
+    """Workers are forked from a clean forkserver that has imported the
+    chart module, never from the bot process, which runs threads by the
+    time the pool starts"""
+    if 'forkserver' not in get_all_start_methods():
+        return get_context('spawn')
+    context = get_context('forkserver')
+    context.set_forkserver_preload(['services.charts'])
+    return context
+
+
+def _warmup() -> int:
+    import os
+    return os.getpid()
+
+
+def _render(df, pct: int, depth_type: int):
+    from services.charts import make_chart_depth
+
+    started = time.perf_counter()
+    result = make_chart_depth(df, pct, depth_type)
+    return result, time.perf_counter() - started
+
+
+class RenderService:
+    """Renders depth charts in a bounded pool of pre-warmed worker processes"""
+
+    def __init__(self, workers: int = 2, max_queue: int = 32, timeout: float = 30.0):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.executor = None
+        self._starting = None
+        self._slots = asyncio.Semaphore(workers + max_queue)
+        self._in_flight = 0
+        self._rendered = 0
+        self._failed = 0
+        self._rejected = 0
+        self._restarts = 0
+        self._render_times = deque(maxlen=500)
+        self._wait_times = deque(maxlen=500)
+
+    async def start(self):
+        """Spawn the worker processes and wait until all of them are warm;
+        concurrent callers wait for the same start-up"""
+        if self._starting is None:
+            self._starting = asyncio.ensure_future(self._start())
+        await asyncio.shield(self._starting)
+
+    async def _start(self):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=_mp_context(),
+                initializer=_init_worker
+            )
+            pids = await asyncio.gather(*[
+                loop.run_in_executor(self.executor, _warmup)
+                for _ in range(self.workers)
+            ])
+        except Exception:
+            # Let the next render try again with a fresh pool
+            self._starting = None
+            if self.executor:
+                executor, self.executor = self.executor, None
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        logging.info(
+            f"Render pool ready: {len(set(pids))} workers "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+    async def close(self):
+        if self._starting is not None and not self._starting.done():
+            self._starting.cancel()
+        self._starting = None
+        if self.executor:
+            executor, self.executor = self.executor, None
+            await asyncio.get_running_loop().run_in_executor(
+                None, partial(executor.shutdown, wait=True, cancel_futures=True)
+            )
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of render jobs waiting for a free worker"""
+        return max(0, self._in_flight - self.workers)
+
+    async def render(self, df, pct: int, depth_type: int):
+        """Render a depth chart without blocking the event loop"""
+        await self.start()
+
+        # Only ship the columns this chart needs to the worker
+        columns = ['event_time', 'best_bid', 'best_ask',
+                   f'depth_{pct}pct_bid', f'depth_{pct}pct_ask']
+        df = df[[col for col in columns if col in df.columns]]
+
+        if self._slots.locked():
+            self._rejected += 1
+            raise RenderQueueFull(
+                f"Render queue is full ({self._in_flight} jobs in flight)"
+            )
+
+        await self._slots.acquire()
+        self._in_flight += 1
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        submitted = time.perf_counter()
+        try:
+            future = executor.submit(_render, df, pct, depth_type)
+        except Exception as e:
+            self._job_done()
+            self._failed += 1
+            if isinstance(e, BrokenProcessPool):
+                self._restart(executor)
+            raise
+        # The slot is held until the worker is free again, not until we
+        # stop waiting, so a timed out render still counts against the cap
+        future.add_done_callback(lambda _: self._call_soon(loop, self._job_done))
+
+        try:
+            result, render_time = await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout=self.timeout
+            )
+        except BrokenProcessPool:
+            self._failed += 1
+            self._restart(executor)
+            raise
+        except Exception:
+            self._failed += 1
+            raise
+
+        wait_time = time.perf_counter() - submitted - render_time
+        self._rendered += 1
+        self._render_times.append(render_time)
+        self._wait_times.append(wait_time)
+        STAGE_SECONDS.observe(render_time, stage='render')
+        STAGE_SECONDS.observe(wait_time, stage='render_wait')
+        return result
+
+    def _job_done(self):
+        self._in_flight -= 1
+        self._slots.release()
+
+    @staticmethod
+    def _call_soon(loop: asyncio.AbstractEventLoop, callback):
+        try:
+            loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            # The loop is already closed
+            pass
+
+    def _restart(self, executor: ProcessPoolExecutor):
+        """Drop a pool whose worker died; the next render starts a new one"""
+        if self.executor is not executor:
+            return
+        logging.error("Render worker died, restarting the render pool")
+        self._restarts += 1
+        self.executor = None
+        self._starting = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        render_times = self._render_times
+        wait_times = self._wait_times
+        return {
+            'workers': self.workers,
+            'in_flight': self._in_flight,
+            'queue_depth': self.queue_depth,
+            'rendered': self._rendered,
+            'failed': self._failed,
+            'rejected': self._rejected,
+            'restarts': self._restarts,
+            'avg_render_sec': sum(render_times) / len(render_times) if render_times else 0.0,
+            'max_render_sec': max(render_times) if render_times else 0.0,
+            'avg_wait_sec': sum(wait_times) / len(wait_times) if wait_times else 0.0,
+        }
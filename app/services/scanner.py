@@ -0,0 +1,72 @@
+import asyncio
+import html
+import logging
+import time
+
+import numpy as np
+
+from services.lob_data import fetch_lob_columns
+from services.lob_decode import DEPTH_PCTS
+from services.lob_metrics import ASK_COLUMNS, BID_COLUMNS, depth_imbalance
+
+
+async def fetch_latest(symbols: list[str], columns: list[str], concurrency: int = 20):
+    """Latest value of `columns` for every symbol as an (n, len(columns))
+    array, one API request per symbol. Symbols without data are left out."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(symbol):
+        async with semaphore:
+            return symbol, await fetch_lob_columns(symbol, {"limit": 1})
+
+    found = []
+    rows = []
+    nan = np.full(1, np.nan)
+    for symbol, decoded in await asyncio.gather(*[fetch(symbol) for symbol in symbols]):
+        if decoded is None or not len(decoded[0]):
+            continue
+        _, values = decoded
+        rows.append([values.get(col, nan)[-1] for col in columns])
+        found.append(symbol)
+
+    return found, np.array(rows, dtype=np.float64).reshape(len(found), len(columns))
+
+
+async def fetch_latest_depths(symbols: list[str], concurrency: int = 20):
+    """Latest bid/ask depth of every symbol as two (n, len(DEPTH_PCTS))
+    arrays. Symbols without data are left out."""
+    found, values = await fetch_latest(symbols, BID_COLUMNS + ASK_COLUMNS, concurrency)
+    n = len(DEPTH_PCTS)
+    return found, values[:, :n], values[:, n:]
+
+
+async def scan_imbalance(symbols: list[str], pct: int = None,
+                         top_n: int = 15, concurrency: int = 20):
+    """Most imbalanced symbols by |imbalance| at `pct`, or at the most
+    imbalanced level when pct is None. Returns (symbols, imbalance rows,
+    number of symbols scanned)."""
+    started = time.perf_counter()
+    found, bids, asks = await fetch_latest_depths(symbols, concurrency)
+    imbalance = depth_imbalance(bids, asks)
+
+    if pct is None:
+        score = np.nanmax(np.abs(imbalance), axis=1, initial=0.0)
+    else:
+        score = np.abs(imbalance[:, DEPTH_PCTS.index(pct)])
+    score = np.nan_to_num(score, nan=-1.0)
+
+    top = np.argsort(-score, kind='stable')[:top_n]
+    logging.info(
+        f"Scanned {len(found)}/{len(symbols)} symbols in {time.perf_counter() - started:.2f}s"
+    )
+    return [found[i] for i in top], imbalance[top], len(found)
+
+
+def format_scan_table(symbols: list[str], imbalance: np.ndarray) -> str:
+    """Monospaced imbalance table for an HTML <pre> block"""
+    header = f"{'Symbol':<12}" + "".join(f"{f'{pct}%':>8}" for pct in DEPTH_PCTS)
+    lines = [header, "-" * len(header)]
+    for symbol, row in zip(symbols, imbalance):
+        cells = "".join(f"{'n/a':>8}" if np.isnan(v) else f"{v:>+8.1f}" for v in row)
+        lines.append(f"{symbol[:12]:<12}{cells}")
+    return "<pre>" + html.escape("\n".join(lines)) + "</pre>"
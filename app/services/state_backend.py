@@ -0,0 +1,159 @@
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+class StateBackend(ABC):
+    """Key/value store for state bot replicas can share: values are bytes, keys
+    expire after an optional TTL in seconds"""
+
+    # Whether other replicas see what this backend stores
+    shared = False
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    async def set_if_absent(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """Atomically set key unless it exists; used as a short-lived lock"""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    # Hashes: one key holding many fields, each updated on its own
+
+    @abstractmethod
+    async def hget(self, key: str, field: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def hset(self, key: str, field: str, value: bytes):
+        ...
+
+    @abstractmethod
+    async def hdel(self, key: str, field: str):
+        ...
+
+    @abstractmethod
+    async def hgetall(self, key: str) -> dict[str, bytes]:
+        ...
+
+    async def close(self):
+        pass
+
+
+class MemoryBackend(StateBackend):
+    """Process-local backend for a single replica"""
+
+    def __init__(self):
+        self._data: dict[str, tuple[bytes, Optional[float]]] = {}
+        self._hashes: dict[str, dict[str, bytes]] = {}
+
+    def _alive(self, key: str) -> bool:
+        entry = self._data.get(key)
+        if entry is None:
+            return False
+        expires_at = entry[1]
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return False
+        return True
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._data[key][0] if self._alive(key) else None
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+
+    async def set_if_absent(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        if self._alive(key):
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+        self._hashes.pop(key, None)
+
+    async def hget(self, key: str, field: str) -> Optional[bytes]:
+        return self._hashes.get(key, {}).get(field)
+
+    async def hset(self, key: str, field: str, value: bytes):
+        self._hashes.setdefault(key, {})[field] = value
+
+    async def hdel(self, key: str, field: str):
+        fields = self._hashes.get(key, {})
+        fields.pop(field, None)
+        if not fields:
+            self._hashes.pop(key, None)
+
+    async def hgetall(self, key: str) -> dict[str, bytes]:
+        return dict(self._hashes.get(key, {}))
+
+
+class RedisBackend(StateBackend):
+    """Backend on any Redis-protocol server, shared by all replicas"""
+
+    shared = True
+
+    def __init__(self, redis):
+        self.redis = redis
+
+    @classmethod
+    def from_url(cls, url: str) -> 'RedisBackend':
+        from redis.asyncio import Redis
+        return cls(Redis.from_url(url))
+
+    @staticmethod
+    def _px(ttl: Optional[float]) -> Optional[int]:
+        return max(1, int(ttl * 1000)) if ttl else None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.redis.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        await self.redis.set(key, value, px=self._px(ttl))
+
+    async def set_if_absent(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return bool(await self.redis.set(key, value, px=self._px(ttl), nx=True))
+
+    async def delete(self, key: str):
+        await self.redis.delete(key)
+
+    async def hget(self, key: str, field: str) -> Optional[bytes]:
+        return await self.redis.hget(key, field)
+
+    async def hset(self, key: str, field: str, value: bytes):
+        await self.redis.hset(key, field, value)
+
+    async def hdel(self, key: str, field: str):
+        await self.redis.hdel(key, field)
+
+    async def hgetall(self, key: str) -> dict[str, bytes]:
+        fields = await self.redis.hgetall(key)
+        return {field.decode() if isinstance(field, bytes) else field: value
+                for field, value in fields.items()}
+
+    async def close(self):
+        await self.redis.aclose()
+
+
+def create_backend(kind: str, redis_url: str = '') -> StateBackend:
+    if kind == 'redis':
+        return RedisBackend.from_url(redis_url)
+    return MemoryBackend()
+
+
+def create_fsm_storage(kind: str, redis_url: str = '', key_prefix: str = 'fsm'):
+    """aiogram FSM storage matching the state backend"""
+    if kind == 'redis':
+        from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+        return RedisStorage.from_url(redis_url, key_builder=DefaultKeyBuilder(prefix=key_prefix))
+    from aiogram.fsm.storage.memory import MemoryStorage
+    return MemoryStorage()
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Awaitable, Callable
+
+
+class SymbolRegistry:
+    """Active symbols loaded at startup and refreshed in the background.
+    Lookups are O(1); the last good list is kept when the API is down.
+
+    With a shared `backend` replicas publish the list there; a replica
+    reuses a fresh shared list and only one replica at a time (holding
+    a short lock) fetches from the API."""
+
+    def __init__(self, fetcher: Callable[[], Awaitable[list]],
+                 interval: float = 300.0, jitter: float = 30.0,
+                 backend=None, key: str = 'symbols'):
+        self.fetcher = fetcher
+        self.interval = interval
+        self.jitter = jitter
+        self.backend = backend
+        self.key = key
+        self.symbols: list[str] = []
+        self._index: dict[str, int] = {}
+        self.updated_at = None
+        self.failures = 0
+        self._task = None
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._index
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    @property
+    def age(self):
+        """Seconds since the last successful refresh"""
+        if self.updated_at is None:
+            return None
+        return time.monotonic() - self.updated_at
+
+    def _apply(self, symbols: list):
+        self.symbols = list(symbols)
+        self._index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.updated_at = time.monotonic()
+        self.failures = 0
+
+    async def _read_shared(self):
+        """(symbols, age in seconds) published by any replica, or None"""
+        try:
+            raw = await self.backend.get(self.key)
+            if raw is None:
+                return None
+            shared = json.loads(raw)
+            return shared['symbols'], time.time() - shared['updated']
+        except Exception as e:
+            logging.warning(f"Shared symbol list unavailable: {e}")
+            return None
+
+    async def _refresh_shared(self) -> bool:
+        """True when the shared list was used instead of the API"""
+        shared = await self._read_shared()
+        if shared and shared[0] and shared[1] < self.interval:
+            self._apply(shared[0])
+            return True
+        try:
+            leader = await self.backend.set_if_absent(f"{self.key}:lock", b'1', ttl=60)
+        except Exception as e:
+            logging.warning(f"Symbol refresh lock unavailable: {e}")
+            leader = True
+        if not leader and shared and shared[0]:
+            # Another replica is refreshing; a slightly stale list will do
+            self._apply(shared[0])
+            return True
+        return False
+
+    async def refresh(self) -> bool:
+        """Fetch symbols once; keep the previous list on failure"""
+        if self.backend is not None and await self._refresh_shared():
+            return True
+
+        try:
+            symbols = await self.fetcher()
+        except Exception as e:
+            logging.exception(f"Symbol refresh error: {e}")
+            symbols = None
+
+        if not symbols:
+            self.failures += 1
+            logging.warning(
+                f"Symbol refresh failed, serving {len(self.symbols)} cached symbols"
+            )
+            return False
+
+        self._apply(symbols)
+        logging.info(f"Symbol registry refreshed: {len(self.symbols)} symbols")
+
+        if self.backend is not None:
+            try:
+                await self.backend.set(self.key, json.dumps(
+                    {'symbols': self.symbols, 'updated': time.time()}
+                ).encode())
+                await self.backend.delete(f"{self.key}:lock")
+            except Exception as e:
+                logging.warning(f"Could not publish symbol list: {e}")
+        return True
+
+    async def start(self):
+        """Initial load, then keep refreshing in the background"""
+        await self.refresh()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            delay = self.interval + random.uniform(-self.jitter, self.jitter)
+            # Retry sooner while we have nothing to serve
+            if not self.symbols:
+                delay = min(delay, 10.0)
+            await asyncio.sleep(max(1.0, delay))
+            await self.refresh()
@@ -1,12 +1,4 @@
-import pandas as pd
-import matplotlib
-
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-
 from typing import Literal
-import os
-import logging
 
 DepthType = Literal[1, 3, 5, 8]
 depths = {
@@ -58,85 +50,3 @@ def split_list_into_strings(lst, max_length=4000, separator=', '):
         results.append(chunk_text)
     
     return results
-
-def make_chart_depth(df: pd.DataFrame, pct: int, depth_type: int):    
-    if df.empty:
-        raise ValueError("DataFrame is empty")
-    
-    if 'event_time' not in df.columns:
-        raise ValueError("DataFrame must contain 'event_time' column")
-    
-    df_sorted = df.sort_values('event_time').reset_index(drop=True)
-    
-    # docker dir for images
-    filename = os.path.join("/tmp/images", f"output_graph_{os.getpid()}.png")    
-    
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
-    
-    width_px, height_px = 500, 900
-    dpi = 100
-    
-    plt.ioff()
-    plt.style.use('dark_background')
-    
-    try:
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(width_px/dpi, height_px/dpi), 
-                                       sharex=True, dpi=dpi)
-
-        # Top plot: best bid/ask
-        ax1.plot(df_sorted['event_time'], df_sorted['best_bid'], 
-                 color='green', label='Best Bid', linewidth=1)
-        ax1.plot(df_sorted['event_time'], df_sorted['best_ask'], 
-                 color='red', label='Best Ask', linewidth=1)
-        ax1.set_ylabel('Price', color='white')
-        ax1.legend()
-        ax1.tick_params(axis='y', colors='white')
-        ax1.grid(True, linestyle='--', alpha=0.3, color='gray')
-
-        depth_lst = get_depths(pct)
-        description = ""
-
-        # Bottom plot based on depth type
-        if depth_type == 0:
-            description = f"Depth ({pct}% Bid/Ask)"
-            ax2.plot(df_sorted['event_time'], df_sorted[depth_lst[0]], 
-                    color='lightgreen', label=f'Bid {pct}%', linewidth=1)
-            ax2.plot(df_sorted['event_time'], df_sorted[depth_lst[1]], 
-                    color='lightcoral', label=f'Ask {pct}%', linewidth=1)
-            ax2.set_ylabel('Volume', color='white')
-            ax2.legend()
-        elif depth_type == 1:
-            description = f"Depth ({pct}% K Bid/Ask)"
-            if all(col in df_sorted.columns for col in depth_lst):
-                df_sorted['k_ratio'] = (pd.to_numeric(df_sorted[depth_lst[0]], errors='coerce') / 
-                                      pd.to_numeric(df_sorted[depth_lst[1]], errors='coerce'))
-                ax2.plot(df_sorted['event_time'], df_sorted['k_ratio'], 
-                        color='blue', label='Bid/Ask Ratio', linewidth=1)
-                ax2.set_ylabel('Ratio', color='white')
-                ax2.legend()
-        elif depth_type == 2:
-            description = f"Depth ({pct}% diff % Bids-Asks)"
-            if all(col in df_sorted.columns for col in depth_lst):
-                bid_vol = pd.to_numeric(df_sorted[depth_lst[0]], errors='coerce')
-                ask_vol = pd.to_numeric(df_sorted[depth_lst[1]], errors='coerce')
-                df_sorted['diff_pct'] = (bid_vol - ask_vol) / (bid_vol + ask_vol) * 100
-                ax2.plot(df_sorted['event_time'], df_sorted['diff_pct'], 
-                        color='cyan', label='Bid-Ask Diff %', linewidth=1)
-                ax2.set_ylabel('Difference %', color='white')
-                ax2.legend()
-        
-        ax2.tick_params(axis='y', colors='white')
-        ax2.grid(True, linestyle='--', alpha=0.3, color='gray')
-
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-
-        plt.savefig(filename, dpi=dpi, bbox_inches='tight', 
-                    facecolor='#1a1a1a', edgecolor='none')
-        
-        logging.info(f"Chart saved: {filename}")
-        return filename, description
-        
-    finally:
-        plt.close(fig)
-        plt.close('all')
@@ -0,0 +1,358 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+
+from services.lob_decode import DEPTH_PCTS
+from services.lob_metrics import ASK_COLUMNS, BID_COLUMNS, depth_imbalance, spread_bps
+from services.metrics import STAGE_SECONDS
+from services.scanner import fetch_latest
+
+
+# Metric columns evaluated per symbol: imbalance at each depth level, then spread
+SPREAD = 'spread'
+METRICS = [str(pct) for pct in DEPTH_PCTS] + [SPREAD]
+WATCH_COLUMNS = BID_COLUMNS + ASK_COLUMNS + ['best_bid', 'best_ask']
+
+
+def compute_metrics(values: np.ndarray) -> np.ndarray:
+    """(n, len(WATCH_COLUMNS)) latest values -> (n, len(METRICS)): signed
+    imbalance in percent per depth level and the spread in bps"""
+    n = len(DEPTH_PCTS)
+    bids, asks = values[:, :n], values[:, n:2 * n]
+    spread = spread_bps(values[:, 2 * n], values[:, 2 * n + 1])
+    return np.column_stack([depth_imbalance(bids, asks), spread])
+
+
+def describe_watch(metric: str, threshold: float, direction: int) -> str:
+    sign = {1: '≥ +', -1: '≤ -', 0: '|x| ≥ '}[direction]
+    if metric == SPREAD:
+        return f"spread ≥ {threshold:g} bps"
+    return f"imbalance at {metric}% {sign}{threshold:g}%"
+
+
+class WatchScheduler:
+    """Threshold alerts on order book imbalance and spread.
+
+    One background task polls every watched symbol once per `interval`,
+    however many chats watch it, and evaluates all subscriptions in one
+    vectorized pass. Alerts are edge-triggered: a watch fires when its
+    metric crosses the threshold and re-arms once it is back below.
+    Subscriptions are kept in a JSON file, written at most once per
+    `save_delay` seconds and reloaded on start.
+
+    With a shared `backend` subscriptions live there instead, one hash
+    field per chat, so every replica sees the same watches. Only the
+    replica holding the poller lease polls and alerts; after a failover
+    the new poller may repeat an alert that is still above threshold."""
+
+    def __init__(self, send: Callable[[int, str], Awaitable], path: str,
+                 interval: float = 30.0, concurrency: int = 20,
+                 fanout: int = 10, max_per_chat: int = 20, save_delay: float = 1.0,
+                 backend=None, key: str = 'watches'):
+        self.send = send
+        self.path = path
+        self.backend = backend
+        self.key = key
+        self._token = uuid.uuid4().hex.encode()
+        self.interval = interval
+        self.concurrency = concurrency
+        self.fanout = fanout
+        self.max_per_chat = max_per_chat
+        self.save_delay = save_delay
+        # (chat_id, symbol, metric) -> (threshold, direction)
+        self._watches: dict[tuple[int, str, str], tuple[float, int]] = {}
+        self._by_chat: dict[int, set[tuple]] = {}
+        self._dirty = True
+        self._unsaved = False
+        self._save_task = None
+        self._task = None
+        self.ticks = 0
+        self.alerts = 0
+        self.failed_alerts = 0
+        self.last_tick_sec = 0.0
+
+        # Columnar view of _watches, rebuilt when subscriptions change
+        self._keys: list[tuple] = []
+        self._symbols: list[str] = []
+        self._symbol_idx = np.empty(0, dtype=np.intp)
+        self._metric_idx = np.empty(0, dtype=np.intp)
+        self._threshold = np.empty(0)
+        self._direction = np.empty(0, dtype=np.int8)
+        self._above = np.empty(0, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self._watches)
+
+    async def watches(self, chat_id: int) -> list[tuple[str, str, float, int]]:
+        await self._sync_chat(chat_id)
+        return [(symbol, metric, *self._watches[(chat_id, symbol, metric)])
+                for _, symbol, metric in sorted(self._by_chat.get(chat_id, ()))]
+
+    def _put(self, key: tuple, threshold: float, direction: int):
+        self._watches[key] = (threshold, direction)
+        self._by_chat.setdefault(key[0], set()).add(key)
+
+    def _drop(self, key: tuple):
+        del self._watches[key]
+        chat_keys = self._by_chat[key[0]]
+        chat_keys.discard(key)
+        if not chat_keys:
+            del self._by_chat[key[0]]
+
+    async def add(self, chat_id: int, symbol: str, metric: str,
+                  threshold: float, direction: int = 0):
+        """Add or update a watch; raises ValueError over the per-chat limit"""
+        await self._sync_chat(chat_id)
+        key = (chat_id, symbol, metric)
+        if key not in self._watches and len(self._by_chat.get(chat_id, ())) >= self.max_per_chat:
+            raise ValueError(f"At most {self.max_per_chat} watches per chat")
+        self._put(key, threshold, direction)
+        await self._changed(chat_id)
+
+    async def remove(self, chat_id: int, symbol: str, metric: Optional[str] = None) -> int:
+        """Remove the chat's watches on symbol (all metrics unless given)"""
+        await self._sync_chat(chat_id)
+        keys = [key for key in self._by_chat.get(chat_id, ())
+                if key[1] == symbol and metric in (None, key[2])]
+        for key in keys:
+            self._drop(key)
+        if keys:
+            await self._changed(chat_id)
+        return len(keys)
+
+    @staticmethod
+    def _encode(items: list[tuple[tuple, tuple[float, int]]]) -> list[dict]:
+        return [{'chat_id': chat_id, 'symbol': symbol, 'metric': metric,
+                 'threshold': threshold, 'direction': direction}
+                for (chat_id, symbol, metric), (threshold, direction) in items]
+
+    @staticmethod
+    def _decode(items: list[dict]) -> dict[tuple, tuple[float, int]]:
+        return {(int(item['chat_id']), item['symbol'], item['metric']):
+                (float(item['threshold']), int(item.get('direction', 0))) for item in items}
+
+    def _replace(self, watches: dict[tuple, tuple[float, int]], chat_id: Optional[int] = None):
+        """Make the local watches (of one chat, or all) match `watches`"""
+        if chat_id is None:
+            current = dict(self._watches)
+        else:
+            current = {key: self._watches[key] for key in self._by_chat.get(chat_id, ())}
+        if current == watches:
+            return
+        for key in current:
+            self._drop(key)
+        for key, (threshold, direction) in watches.items():
+            self._put(key, threshold, direction)
+        self._dirty = True
+
+    async def _sync_chat(self, chat_id: int):
+        """Take the chat's watches from the shared backend, where another
+        replica may have changed them"""
+        if self.backend is None:
+            return
+        raw = await self.backend.hget(self.key, str(chat_id))
+        self._replace(self._decode(json.loads(raw)) if raw else {}, chat_id)
+
+    async def _sync_all(self):
+        fields = await self.backend.hgetall(self.key)
+        watches = {}
+        for raw in fields.values():
+            watches.update(self._decode(json.loads(raw)))
+        self._replace(watches)
+
+    async def _changed(self, chat_id: int):
+        self._dirty = True
+        if self.backend is not None:
+            keys = sorted(self._by_chat.get(chat_id, ()))
+            if keys:
+                items = self._encode([(key, self._watches[key]) for key in keys])
+                await self.backend.hset(self.key, str(chat_id), json.dumps(items).encode())
+            else:
+                await self.backend.hdel(self.key, str(chat_id))
+            return
+        self._unsaved = True
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.create_task(self._save_soon())
+
+    async def _save_soon(self):
+        # Bursts of changes are written once
+        while self._unsaved:
+            await asyncio.sleep(self.save_delay)
+            self._unsaved = False
+            await self.save()
+
+    def _rebuild(self):
+        """Refresh the subscription arrays, keeping the alert state of
+        watches that still exist"""
+        previous = dict(zip(self._keys, self._above))
+        self._keys = list(self._watches)
+        self._symbols = sorted({key[1] for key in self._keys})
+        symbol_index = {symbol: i for i, symbol in enumerate(self._symbols)}
+        self._symbol_idx = np.array([symbol_index[key[1]] for key in self._keys], dtype=np.intp)
+        self._metric_idx = np.array([METRICS.index(key[2]) for key in self._keys], dtype=np.intp)
+        self._threshold = np.array([self._watches[key][0] for key in self._keys], dtype=np.float64)
+        self._direction = np.array([self._watches[key][1] for key in self._keys], dtype=np.int8)
+        self._above = np.array([previous.get(key, False) for key in self._keys], dtype=bool)
+        self._dirty = False
+
+    def evaluate(self, metrics: np.ndarray) -> np.ndarray:
+        """Indices of watches that crossed their threshold since the last
+        pass. `metrics` is (len(self._symbols), len(METRICS)), NaN where a
+        symbol had no data; such watches keep their state."""
+        values = metrics[self._symbol_idx, self._metric_idx]
+        signed = np.where(self._direction == 0, np.abs(values), values * self._direction)
+        with np.errstate(invalid='ignore'):
+            above = signed >= self._threshold
+        fired = above & ~self._above
+        self._above = np.where(np.isnan(values), self._above, above)
+        return np.flatnonzero(fired)
+
+    async def _is_poller(self) -> bool:
+        """Take or renew the lease that makes this replica the poller"""
+        lease = f"{self.key}:poller"
+        ttl = self.interval * 3
+        if await self.backend.set_if_absent(lease, self._token, ttl=ttl):
+            return True
+        if await self.backend.get(lease) == self._token:
+            await self.backend.set(lease, self._token, ttl=ttl)
+            return True
+        return False
+
+    async def tick(self):
+        """Poll all watched symbols once and send due alerts"""
+        if self.backend is not None:
+            if not await self._is_poller():
+                return
+            await self._sync_all()
+        if self._dirty:
+            self._rebuild()
+        if not self._keys:
+            return
+
+        started = time.perf_counter()
+        symbols = self._symbols
+        # Subscriptions changed while fetching only mark the arrays dirty;
+        # this pass evaluates the arrays as they were and the next one
+        # picks up the changes
+        found, values = await fetch_latest(symbols, WATCH_COLUMNS, self.concurrency)
+
+        metrics = np.full((len(symbols), len(METRICS)), np.nan)
+        if found:
+            symbol_index = {symbol: i for i, symbol in enumerate(symbols)}
+            metrics[[symbol_index[symbol] for symbol in found]] = compute_metrics(values)
+
+        messages: dict[int, list[str]] = {}
+        for i in self.evaluate(metrics):
+            key = self._keys[i]
+            if key not in self._watches:
+                # Removed while fetching
+                continue
+            chat_id, symbol, metric = key
+            value = metrics[self._symbol_idx[i], self._metric_idx[i]]
+            now = f"{value:.1f} bps" if metric == SPREAD else f"{value:+.1f}%"
+            messages.setdefault(chat_id, []).append(
+                f"{symbol}: {describe_watch(metric, self._threshold[i], self._direction[i])}, "
+                f"now {now}"
+            )
+        await self._deliver(messages)
+
+        self.ticks += 1
+        self.last_tick_sec = time.perf_counter() - started
+        STAGE_SECONDS.observe(self.last_tick_sec, stage='watch_tick')
+
+    async def _deliver(self, messages: dict[int, list[str]]):
+        """One message per chat, at most `fanout` sends in flight"""
+        pending = iter(messages.items())
+
+        async def worker():
+            for chat_id, lines in pending:
+                try:
+                    await self.send(chat_id, "🔔 " + "\n🔔 ".join(lines))
+                    self.alerts += len(lines)
+                except Exception as e:
+                    self.failed_alerts += len(lines)
+                    logging.warning(f"Could not deliver watch alert to {chat_id}: {e}")
+
+        await asyncio.gather(*[worker() for _ in range(min(self.fanout, len(messages)))])
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logging.error(f"Could not load watches from {self.path}: {e}")
+            return
+        for key, (threshold, direction) in self._decode(data.get('watches', [])).items():
+            self._put(key, threshold, direction)
+        self._dirty = True
+        logging.info(f"Loaded {len(self._watches)} watches")
+
+    def _write(self, data: dict):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    async def save(self):
+        data = {'watches': self._encode(list(self._watches.items()))}
+        try:
+            await asyncio.to_thread(self._write, data)
+        except Exception as e:
+            logging.error(f"Could not save watches to {self.path}: {e}")
+
+    async def start(self):
+        if self.backend is None:
+            self.load()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.backend is not None:
+            # Hand the poller lease over without waiting for it to expire
+            try:
+                if await self.backend.get(f"{self.key}:poller") == self._token:
+                    await self.backend.delete(f"{self.key}:poller")
+            except Exception as e:
+                logging.warning(f"Could not release the watch poller lease: {e}")
+            return
+        if self._save_task and not self._save_task.done():
+            self._save_task.cancel()
+            self._unsaved = True
+        if self._unsaved:
+            self._unsaved = False
+            await self.save()
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.tick()
+            except Exception as e:
+                logging.exception(f"Watch tick failed: {e}")
+            await asyncio.sleep(max(1.0, self.interval - (time.monotonic() - started)))
+
+    def stats(self) -> dict:
+        return {
+            'watches': len(self._watches),
+            'symbols': len(self._symbols),
+            'ticks': self.ticks,
+            'alerts': self.alerts,
+            'failed_alerts': self.failed_alerts,
+            'last_tick_sec': self.last_tick_sec,
+        }
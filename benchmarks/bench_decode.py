@@ -0,0 +1,56 @@
+"""Compare the columnar LOB decode path with the original
+json + DataFrame + pd.to_numeric path.
+
+    python benchmarks/bench_decode.py
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+import orjson
+import pandas as pd
+
+from synthetic import generate_rows
+from services.lob_decode import decode_lob_response, columns_to_frame
+
+
+def legacy_decode(body: bytes) -> pd.DataFrame:
+    """The decode path get_lob_depth used before the columnar layer"""
+    df = pd.DataFrame(json.loads(body))
+    df['event_time'] = pd.to_numeric(df['event_time'], errors='coerce')
+    df['event_time'] = pd.to_datetime(df['event_time'], unit='s')
+    for col in [col for col in df.columns if 'depth' in col]:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    for col in ['best_bid', 'best_ask', 'min_bid', 'max_ask']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df.sort_values('event_time').reset_index(drop=True)
+
+
+def columnar_decode(body: bytes) -> pd.DataFrame:
+    return columns_to_frame(*decode_lob_response(body))
+
+
+def bench(func, body: bytes) -> float:
+    number = max(1, 20_000 // (len(body) // 300 + 1))
+    return min(timeit.repeat(lambda: func(body), number=number, repeat=5)) / number
+
+
+def main():
+    print(f"{'rows':>8} {'payload':>10} {'legacy ms':>10} {'columnar ms':>12} {'speedup':>8}")
+    for n in (1_000, 10_000, 100_000):
+        for as_strings in (False, True):
+            body = orjson.dumps(generate_rows(n, as_strings=as_strings))
+            legacy = bench(legacy_decode, body)
+            columnar = bench(columnar_decode, body)
+            kind = 'str' if as_strings else 'num'
+            print(f"{n:>8} {kind:>10} {legacy * 1e3:>10.2f} {columnar * 1e3:>12.2f} "
+                  f"{legacy / columnar:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
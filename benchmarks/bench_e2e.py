@@ -0,0 +1,185 @@
+"""End-to-end benchmark: N simulated users send /check_lob_by_symbol
+to the real dispatcher, handlers, cache, render pool and outbound
+queue, with the LOB API and the Bot API replaced by local mocks.
+
+    python benchmarks/bench_e2e.py --users 20 --requests 5 --limit 5000
+
+Reports request throughput, latency percentiles, per-stage timings
+and peak RSS of the bot process and of its largest render worker, read
+from /proc while the workers are still running.
+"""
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import time
+
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from mock_servers import FakeBotAPI, MockLOBAPI, start_app
+
+TOKEN = '123456:bench'
+
+
+def percentile(samples: list, q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def peak_rss_mib(pid: int) -> float:
+    """VmHWM of a running process, 0 where /proc is unavailable"""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+async def run(args):
+    lob_api = MockLOBAPI(n_symbols=args.symbols, rows=args.rows, latency=args.api_latency)
+    bot_api = FakeBotAPI(latency=args.tg_latency)
+    lob_runner, lob_url = await start_app(lob_api.app)
+    bot_runner, bot_url = await start_app(bot_api.app)
+
+    # core.config reads the environment on import
+    os.environ.update(TG_BOT_TOKEN=TOKEN, API_BASE=lob_url, API_USER='bench', API_PASS='bench')
+
+    from aiogram import Bot, Dispatcher
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from aiogram.fsm.storage.memory import MemoryStorage
+    from aiogram.types import Update
+
+    from core.app_context import app_context
+    from core.config import config
+    from handlers import lob, user
+    from handlers.admin import format_percentiles
+    from services.admission import AdmissionController
+    from services.api_client import APIClient
+    from services.cache import AsyncTTLCache, LRUCache
+    from services.lob_buffer import LOBBufferStore
+    from services.lob_data import get_active_symbols
+    from services.metrics import STAGE_SECONDS
+    from services.outbound import OutboundScheduler
+    from services.render_service import RenderService
+    from services.symbol_registry import SymbolRegistry
+
+    bot = Bot(TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(bot_url)))
+    dp = Dispatcher(storage=MemoryStorage())
+    dp.include_router(user.router)
+    dp.include_router(lob.router)
+
+    started = time.perf_counter()
+    render_service = RenderService(
+        workers=args.workers, max_queue=config.RENDER_MAX_QUEUE, timeout=config.RENDER_TIMEOUT
+    )
+    await render_service.start()
+    app_context.bot = bot
+    app_context.api_client = APIClient(lob_url, 'bench', 'bench')
+    app_context.render_service = render_service
+    app_context.admission = AdmissionController(
+        max_in_flight=config.CHART_MAX_IN_FLIGHT, max_queue=config.CHART_MAX_QUEUE
+    )
+    if args.telegram_limits:
+        app_context.outbound = OutboundScheduler(
+            global_rate=config.OUTBOUND_GLOBAL_RATE,
+            chat_rate=config.OUTBOUND_CHAT_RATE,
+            chat_burst=config.OUTBOUND_CHAT_BURST,
+            max_pending=config.OUTBOUND_MAX_PENDING
+        )
+    else:
+        app_context.outbound = OutboundScheduler(
+            global_rate=1e6, chat_rate=1e6, chat_burst=1e6, max_pending=10 ** 6
+        )
+    app_context.lob_cache = AsyncTTLCache(ttl=config.LOB_CACHE_TTL, max_bytes=config.LOB_CACHE_MAX_BYTES)
+    app_context.range_cache = AsyncTTLCache(ttl=config.LOB_RANGE_CACHE_TTL,
+                                            max_bytes=config.LOB_RANGE_CACHE_MAX_BYTES)
+    app_context.metrics_cache = AsyncTTLCache(ttl=config.LOB_METRICS_CACHE_TTL,
+                                              max_bytes=config.LOB_METRICS_CACHE_MAX_BYTES,
+                                              sizeof=lambda metrics: metrics.nbytes)
+    app_context.chart_cache = LRUCache(max_entries=config.CHART_CACHE_SIZE)
+    app_context.lob_buffers = LOBBufferStore(max_symbols=config.LOB_BUFFER_MAX_SYMBOLS)
+    app_context.symbol_registry = SymbolRegistry(fetcher=get_active_symbols)
+    await app_context.symbol_registry.refresh()
+    print(f"setup {time.perf_counter() - started:.2f}s, "
+          f"{len(app_context.symbol_registry)} symbols")
+
+    symbols = lob_api.symbols[:args.distinct_symbols or args.users]
+    latencies = []
+    update_ids = iter(range(1, 10 ** 9))
+
+    async def simulate_user(n: int):
+        chat_id = 10_000 + n
+        for i in range(args.requests):
+            symbol = symbols[(n + i) % len(symbols)]
+            update = Update.model_validate({
+                'update_id': next(update_ids),
+                'message': {
+                    'message_id': i + 1,
+                    'date': int(time.time()),
+                    'chat': {'id': chat_id, 'type': 'private'},
+                    'from': {'id': chat_id, 'is_bot': False, 'first_name': f'user{n}'},
+                    'text': f'/check_lob_by_symbol {symbol} {args.limit}',
+                    'entities': [{'type': 'bot_command', 'offset': 0, 'length': 20}],
+                },
+            }, context={'bot': bot})
+            request_started = time.perf_counter()
+            await dp.feed_update(bot, update)
+            latencies.append(time.perf_counter() - request_started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[simulate_user(n) for n in range(args.users)])
+    elapsed = time.perf_counter() - started
+
+    # Render workers are forkserver children, never reaped by this
+    # process, so RUSAGE_CHILDREN cannot see them
+    workers = render_service.executor._processes if render_service.executor else {}
+    rss_workers = max((peak_rss_mib(pid) for pid in workers), default=0.0)
+    await render_service.close()
+    await app_context.api_client.close()
+    await bot.session.close()
+    await lob_runner.cleanup()
+    await bot_runner.cleanup()
+
+    total = len(latencies)
+    print(f"\n{args.users} users x {args.requests} requests, limit {args.limit}, "
+          f"{len(symbols)} symbols, {args.workers} render workers")
+    print(f"throughput   {total / elapsed:8.2f} req/s ({total} in {elapsed:.2f}s)")
+    print("latency, ms  " + '  '.join(
+        f"p{int(q * 100)} {percentile(latencies, q) * 1000:.0f}" for q in (0.5, 0.95, 0.99)
+    ) + f"  max {max(latencies) * 1000:.0f}")
+    print(f"LOB API      {lob_api.requests} requests, {lob_api.rows_served} rows")
+    print(f"admission    {app_context.admission.stats()}")
+    print(f"Bot API      {dict(sorted(bot_api.calls.items()))}, "
+          f"{bot_api.uploaded_bytes / 2 ** 20:.1f} MiB uploaded")
+    # ru_maxrss is in KiB on Linux
+    rss_self = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"peak RSS     bot {rss_self:.0f} MiB, largest render worker {rss_workers:.0f} MiB")
+    print()
+    print('\n'.join(format_percentiles('stage, ms', STAGE_SECONDS.percentiles())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=5, help='requests per user')
+    parser.add_argument('--limit', type=int, default=1000, help='snapshots per request')
+    parser.add_argument('--symbols', type=int, default=400, help='symbols served by the mock API')
+    parser.add_argument('--distinct-symbols', type=int, default=0,
+                        help='symbols users pick from (default: one per user)')
+    parser.add_argument('--rows', type=int, default=20_000, help='snapshots stored per symbol')
+    parser.add_argument('--workers', type=int, default=4, help='render processes')
+    parser.add_argument('--api-latency', type=float, default=0.0, help='LOB API delay, s')
+    parser.add_argument('--tg-latency', type=float, default=0.0, help='Bot API delay, s')
+    parser.add_argument('--telegram-limits', action='store_true',
+                        help='keep the configured outbound rate limits')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
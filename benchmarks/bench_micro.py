@@ -0,0 +1,56 @@
+"""Micro-benchmarks of the per-request CPU work at 1k, 10k and 100k rows:
+decoding an API response, computing every derived series /lobstats,
+charts and /scan use, and rendering one chart in-process.
+
+    python benchmarks/bench_micro.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+# services.scanner pulls in core.config, which requires these
+for name in ('TG_BOT_TOKEN', 'API_BASE', 'API_USER', 'API_PASS'):
+    os.environ.setdefault(name, 'bench')
+
+import matplotlib
+matplotlib.use('Agg')
+import orjson
+
+from synthetic import generate_rows
+from services.lob_decode import columns_to_frame, decode_lob_response
+from services.lob_metrics import LOBMetrics
+from services.charts import make_chart_depth
+
+
+def decode(body: bytes):
+    return columns_to_frame(*decode_lob_response(body))
+
+
+def metrics(df):
+    """Ratio, imbalance, spread, mid and rolling z-scores at every depth level"""
+    return LOBMetrics.from_frame(df)
+
+
+def bench(func, *args, budget: float = 1.0) -> float:
+    """Best seconds per call, running roughly `budget` seconds per repeat"""
+    once = timeit.timeit(lambda: func(*args), number=1)
+    number = max(1, int(budget / 5 / max(once, 1e-6)))
+    return min(timeit.repeat(lambda: func(*args), number=number, repeat=5)) / number
+
+
+def main():
+    make_chart_depth(decode(orjson.dumps(generate_rows(100))), 1, 0)  # fonts, style, figure
+
+    print(f"{'rows':>8} {'decode ms':>10} {'metrics ms':>11} {'render ms':>10}")
+    for n in (1_000, 10_000, 100_000):
+        body = orjson.dumps(generate_rows(n))
+        df = decode(body)
+        print(f"{n:>8} {bench(decode, body) * 1e3:>10.2f} "
+              f"{bench(metrics, df) * 1e3:>11.3f} "
+              f"{bench(make_chart_depth, df, 1, 0) * 1e3:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
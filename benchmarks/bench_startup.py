@@ -0,0 +1,131 @@
+"""Cold start benchmark: launches main.py against the mock LOB API and
+fake Bot API, and measures how long it takes until the bot polls for
+updates and until the first user's chart arrives.
+
+    python benchmarks/bench_startup.py --runs 3
+    python benchmarks/bench_startup.py --app /path/to/other/checkout/app
+
+The first user sends /check_lob_by_symbol as soon as the bot polls;
+updates queued before that are dropped at start-up, as in production.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(__file__))
+
+from mock_servers import FakeBotAPI, MockLOBAPI, start_app
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+TOKEN = '123456:bench'
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import main{extra}; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def import_seconds(app_dir: str, env: dict, extra: str = '') -> float:
+    """`import main` in a fresh interpreter, plus any `extra` modules"""
+    output = subprocess.run(
+        [sys.executable, '-c', IMPORT_SNIPPET.format(extra=extra)],
+        cwd=app_dir, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+async def cold_start(app_dir: str, env: dict, bot_api: FakeBotAPI, log_path: str,
+                     timeout: float) -> tuple[float, float]:
+    """Seconds from launch to the first getUpdates and to the first chart"""
+    bot_api.reset()
+
+    with open(log_path, 'w') as log:
+        launched = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, 'main.py', cwd=app_dir, env=env,
+            stdout=log, stderr=subprocess.STDOUT
+        )
+        try:
+            deadline = launched + timeout
+            requested = False
+            while 'sendPhoto' not in bot_api.first_call:
+                if process.returncode is not None or time.perf_counter() > deadline:
+                    raise RuntimeError(f"No chart was sent, see {log_path}")
+                if not requested and 'getUpdates' in bot_api.first_call:
+                    bot_api.push_update('/check_lob_by_symbol BTCUSDT')
+                    requested = True
+                await asyncio.sleep(0.01)
+        finally:
+            if process.returncode is None:
+                process.send_signal(signal.SIGINT)
+                try:
+                    await asyncio.wait_for(process.wait(), 30)
+                except asyncio.TimeoutError:
+                    process.kill()
+                    await process.wait()
+
+    return (bot_api.first_call['getUpdates'] - launched,
+            bot_api.first_call['sendPhoto'] - launched)
+
+
+async def run(args):
+    lob_api = MockLOBAPI(n_symbols=50, rows=args.limit)
+    bot_api = FakeBotAPI()
+    lob_runner, lob_url = await start_app(lob_api.app)
+    bot_runner, bot_url = await start_app(bot_api.app)
+
+    env = dict(
+        os.environ,
+        TG_BOT_TOKEN=TOKEN, API_BASE=lob_url, API_USER='bench', API_PASS='bench',
+        TELEGRAM_API_URL=bot_url, METRICS_PORT='0',
+        RENDER_WORKERS=str(args.workers), LOB_DEFAULT_LIMIT=str(args.limit),
+    )
+    app_dir = os.path.abspath(args.app)
+
+    lazy = import_seconds(app_dir, env)
+    eager = import_seconds(app_dir, env, extra=', pandas, matplotlib.pyplot')
+    print(f"import main            {lazy:6.2f}s")
+    print(f"  + pandas, matplotlib {eager:6.2f}s")
+
+    polling, first_chart = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for run_number in range(args.runs):
+            log_path = os.path.join(tmp, f'run{run_number}.log')
+            try:
+                to_polling, to_chart = await cold_start(
+                    app_dir, env, bot_api, log_path, args.timeout
+                )
+            except RuntimeError:
+                with open(log_path) as log:
+                    print(log.read()[-3000:])
+                raise
+            polling.append(to_polling)
+            first_chart.append(to_chart)
+            print(f"run {run_number + 1}: polling after {to_polling:.2f}s, "
+                  f"first chart after {to_chart:.2f}s")
+
+    print(f"\nmedian of {args.runs}, {args.workers} render workers")
+    print(f"launch -> polling      {statistics.median(polling):6.2f}s")
+    print(f"launch -> first chart  {statistics.median(first_chart):6.2f}s")
+
+    await lob_runner.cleanup()
+    await bot_runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--app', default=APP_DIR, help='directory holding main.py')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=4, help='render processes')
+    parser.add_argument('--limit', type=int, default=1000, help='snapshots per chart')
+    parser.add_argument('--timeout', type=float, default=120.0, help='seconds per run')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
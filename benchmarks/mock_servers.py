@@ -0,0 +1,167 @@
+"""Local stand-ins for the LOB API and the Telegram Bot API, used by
+the end-to-end benchmark."""
+import asyncio
+import itertools
+import json
+import time
+import zlib
+
+import orjson
+from aiohttp import web
+
+from synthetic import generate_rows, generate_symbols
+
+
+async def start_app(app: web.Application, host: str = '127.0.0.1', port: int = 0):
+    """Serve app on a free port; returns (runner, base URL)"""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{port}"
+
+
+class MockLOBAPI:
+    """/auth/token, /crypto/symbols and /crypto/data/{symbol} over
+    synthetic data; each symbol holds `rows` snapshots generated on
+    first use. `latency` seconds are added to every data response."""
+
+    def __init__(self, n_symbols: int = 400, rows: int = 20_000, latency: float = 0.0):
+        self.symbols = generate_symbols(n_symbols)
+        self.rows = rows
+        self.latency = latency
+        self.requests = 0
+        self.rows_served = 0
+        self._data: dict[str, list] = {}
+
+        self.app = web.Application()
+        self.app.router.add_post('/auth/token', self.handle_auth)
+        self.app.router.add_get('/crypto/symbols', self.handle_symbols)
+        self.app.router.add_get('/crypto/data/{symbol}', self.handle_data)
+
+    def data(self, symbol: str) -> list:
+        if symbol not in self._data:
+            self._data[symbol] = generate_rows(
+                self.rows, start=time.time() - self.rows, seed=zlib.crc32(symbol.encode())
+            )
+        return self._data[symbol]
+
+    async def handle_auth(self, request: web.Request) -> web.Response:
+        await request.post()
+        return web.json_response({'access_token': 'bench-token', 'expires_in': 3600})
+
+    async def handle_symbols(self, request: web.Request) -> web.Response:
+        return web.json_response(self.symbols)
+
+    async def handle_data(self, request: web.Request) -> web.Response:
+        symbol = request.match_info['symbol']
+        if symbol not in self.symbols:
+            return web.json_response({'detail': 'unknown symbol'}, status=404)
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        rows = self.data(symbol)
+        since = request.query.get('start_time')
+        until = request.query.get('end_time')
+        if since is not None:
+            rows = [row for row in rows if row['event_time'] > float(since)]
+        if until is not None:
+            rows = [row for row in rows if row['event_time'] < float(until)]
+        rows = rows[-int(request.query.get('limit', 1000)):]
+        self.rows_served += len(rows)
+        return web.Response(body=orjson.dumps(rows), content_type='application/json')
+
+
+class FakeBotAPI:
+    """Answers the Bot API methods the bot uses with plausible results.
+    Uploaded photos are parsed in full; `latency` is added per call.
+    Updates added with `push_update` are served to getUpdates polling."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: dict[str, int] = {}
+        self.first_call: dict[str, float] = {}
+        self.uploaded_bytes = 0
+        self.updates: list[dict] = []
+        self._ids = itertools.count(1)
+
+        self.app = web.Application(client_max_size=64 * 1024 * 1024)
+        self.app.router.add_post('/bot{token}/{method}', self.handle_method)
+
+    def reset(self):
+        self.calls.clear()
+        self.first_call.clear()
+        self.updates.clear()
+        self.uploaded_bytes = 0
+
+    def push_update(self, text: str, chat_id: int = 10_000):
+        update_id = len(self.updates) + 1
+        self.updates.append({
+            'update_id': update_id,
+            'message': {
+                'message_id': update_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': {'id': chat_id, 'is_bot': False, 'first_name': 'bench'},
+                'text': text,
+                'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}],
+            },
+        })
+
+    async def poll_updates(self, offset: int, timeout: float) -> list[dict]:
+        """Long polling: wait up to `timeout` seconds for updates past offset"""
+        deadline = time.perf_counter() + timeout
+        while True:
+            pending = [update for update in self.updates if update['update_id'] >= offset]
+            if pending or time.perf_counter() >= deadline:
+                return pending
+            await asyncio.sleep(0.05)
+
+    def message(self, chat_id, photo: bool = False) -> dict:
+        message_id = next(self._ids)
+        message = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+        }
+        if photo:
+            message['photo'] = [{
+                'file_id': f'photo-{message_id}', 'file_unique_id': f'u{message_id}',
+                'width': 500, 'height': 900,
+            }]
+        return message
+
+    async def handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        self.calls[method] = self.calls.get(method, 0) + 1
+        self.first_call.setdefault(method, time.perf_counter())
+        form = await request.post()
+        for value in form.values():
+            if isinstance(value, web.FileField):
+                self.uploaded_bytes += value.file.seek(0, 2)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        chat_id = form.get('chat_id', 0)
+        if method == 'sendMessage':
+            result = self.message(chat_id)
+        elif method == 'sendPhoto':
+            result = self.message(chat_id, photo=True)
+        elif method == 'sendMediaGroup':
+            result = [self.message(chat_id, photo=True) for _ in json.loads(form['media'])]
+        elif method == 'getUpdates':
+            result = await self.poll_updates(
+                int(form.get('offset') or 0), min(float(form.get('timeout') or 0), 1.0)
+            )
+        elif method == 'deleteWebhook':
+            # Like Telegram, forget updates that arrived before start-up
+            if form.get('drop_pending_updates') == 'true':
+                self.updates.clear()
+            result = True
+        elif method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'bench'}
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
@@ -0,0 +1,44 @@
+"""Synthetic LOB data matching the /crypto/data/{symbol} and
+/crypto/symbols response schemas."""
+import numpy as np
+
+
+DEPTH_PCTS = (1, 3, 5, 8)
+
+
+def generate_symbols(n: int) -> list[str]:
+    bases = [f"SYM{i:04d}" for i in range(n)]
+    return ['BTCUSDT', 'ETHUSDT'][:n] + [f"{base}USDT" for base in bases[2:]]
+
+
+def generate_rows(n: int, start: float = 1.7e9, step: float = 1.0,
+                  price: float = 100.0, seed: int = 0,
+                  as_strings: bool = False, newest_first: bool = False) -> list[dict]:
+    """n LOB snapshots one `step` second apart as the API returns them"""
+    rng = np.random.default_rng(seed)
+    event_time = start + np.arange(n) * step
+    mid = price * np.exp(np.cumsum(rng.normal(0, 5e-4, n)))
+    spread = mid * rng.uniform(1e-5, 1e-4, n)
+    columns = {
+        'best_bid': mid - spread / 2,
+        'best_ask': mid + spread / 2,
+        'min_bid': mid * 0.92,
+        'max_ask': mid * 1.08,
+    }
+    for pct in DEPTH_PCTS:
+        scale = 1e5 * pct
+        columns[f'depth_{pct}pct_bid'] = scale * rng.lognormal(0, 0.3, n)
+        columns[f'depth_{pct}pct_ask'] = scale * rng.lognormal(0, 0.3, n)
+
+    convert = str if as_strings else float
+    names = list(columns)
+    values = [columns[name].round(6).tolist() for name in names]
+    rows = []
+    for i in range(n):
+        row = {'event_time': int(event_time[i])}
+        for name, column in zip(names, values):
+            row[name] = convert(column[i])
+        rows.append(row)
+    if newest_first:
+        rows.reverse()
+    return rows
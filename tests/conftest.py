@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The bot imports its packages relative to app/, as main.py does
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+# Settings the config requires; nothing here reaches a real service
+for name, value in {'TG_BOT_TOKEN': '123456:test', 'API_BASE': 'http://lob.invalid',
+                    'API_USER': 'test', 'API_PASS': 'test'}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from core.app_context import app_context
+from core.config import config
+from services import lob_data
+from services.lob_buffer import LOBBufferStore
+from services.lob_decode import LOB_COLUMNS
+from services.lob_store import LOBStore
+
+# An hour of one-second snapshots ending ten minutes ago
+HISTORY = (int(time.time() - 600) - np.arange(3600)[::-1]) * 1_000_000_000
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """fetch_lob_columns stand-in serving HISTORY like the LOB API: the
+    newest `limit` rows after the optional since parameter"""
+    requests = []
+
+    async def fetch_lob_columns(symbol, params):
+        requests.append(dict(params))
+        event_time = HISTORY
+        if config.LOB_API_SINCE_PARAM in params:
+            event_time = event_time[event_time > params[config.LOB_API_SINCE_PARAM] * 1e9]
+        event_time = event_time[-params['limit']:]
+        return event_time, {col: event_time / 1e9 for col in LOB_COLUMNS}
+
+    monkeypatch.setattr(lob_data, 'fetch_lob_columns', fetch_lob_columns)
+    return requests
+
+
+def use_store(monkeypatch, root) -> LOBStore:
+    store = LOBStore(str(root), ingest_lag=0)
+    monkeypatch.setattr(app_context, 'lob_store', store)
+    monkeypatch.setattr(app_context, 'lob_buffers', LOBBufferStore())
+    return store
+
+
+def assert_newest(df, limit: int):
+    assert len(df) == limit
+    assert (df['event_time'].to_numpy().view(np.int64) == HISTORY[-limit:]).all()
+
+
+def test_larger_limit_fetches_older_rows(api, monkeypatch, tmp_path):
+    async def run():
+        store = use_store(monkeypatch, tmp_path)
+        assert_newest(await lob_data.load_lob_depth('BTCUSDT', 500), 500)
+        assert_newest(await lob_data.load_lob_depth('BTCUSDT', 800), 800)
+        # The store held only 500 rows, so the larger buffer was fetched in full
+        assert config.LOB_API_SINCE_PARAM not in api[-1]
+        await store.stop()
+
+    asyncio.run(run())
+
+
+def test_restart_with_short_store_fetches_in_full(api, monkeypatch, tmp_path):
+    async def run():
+        store = use_store(monkeypatch, tmp_path)
+        await lob_data.load_lob_depth('BTCUSDT', 300)
+        await store.stop()
+
+        store = use_store(monkeypatch, tmp_path)
+        assert_newest(await lob_data.load_lob_depth('BTCUSDT', 800), 800)
+        assert config.LOB_API_SINCE_PARAM not in api[-1]
+
+        # A store holding enough rows seeds the buffer, and only newer rows are asked for
+        await store.stop()
+        use_store(monkeypatch, tmp_path)
+        assert_newest(await lob_data.load_lob_depth('BTCUSDT', 800), 800)
+        assert config.LOB_API_SINCE_PARAM in api[-1]
+
+    asyncio.run(run())
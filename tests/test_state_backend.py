@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+
+from services.cache import AsyncTTLCache
+from services.state_backend import MemoryBackend, RedisBackend, StateBackend
+from services.symbol_registry import SymbolRegistry
+
+
+def redis_replicas(count: int = 2) -> list[RedisBackend]:
+    """Backends of `count` replicas sharing one fake Redis server"""
+    server = FakeServer()
+    return [RedisBackend(FakeRedis(server=server)) for _ in range(count)]
+
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'redis': lambda: redis_replicas(1)[0],
+}
+
+
+@pytest.fixture(params=list(BACKENDS))
+def backend(request) -> StateBackend:
+    return BACKENDS[request.param]()
+
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        StateBackend()
+
+
+def test_get_set_delete(backend):
+    async def run():
+        assert await backend.get('k') is None
+        await backend.set('k', b'v')
+        assert await backend.get('k') == b'v'
+        await backend.delete('k')
+        assert await backend.get('k') is None
+        await backend.delete('k')
+        await backend.close()
+    asyncio.run(run())
+
+
+def test_ttl_expires(backend):
+    async def run():
+        await backend.set('k', b'v', ttl=0.05)
+        assert await backend.get('k') == b'v'
+        await asyncio.sleep(0.1)
+        assert await backend.get('k') is None
+        await backend.close()
+    asyncio.run(run())
+
+
+def test_set_if_absent(backend):
+    async def run():
+        assert await backend.set_if_absent('lock', b'1', ttl=0.05)
+        assert not await backend.set_if_absent('lock', b'2', ttl=0.05)
+        assert await backend.get('lock') == b'1'
+        await asyncio.sleep(0.1)
+        assert await backend.set_if_absent('lock', b'3')
+        await backend.close()
+    asyncio.run(run())
+
+
+def test_replicas_share_symbol_list():
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        return ['BTCUSDT', 'ETHUSDT']
+
+    async def run():
+        first, second = [SymbolRegistry(fetch, backend=backend, key='test:symbols')
+                         for backend in redis_replicas()]
+        await first.refresh()
+        await second.refresh()
+        assert calls == 1
+        assert 'ETHUSDT' in second
+
+    asyncio.run(run())
+
+
+def test_replicas_share_cache_entries():
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        return b'depth'
+
+    async def run():
+        caches = [AsyncTTLCache(ttl=10, max_bytes=10**6, backend=backend, namespace='test:lob',
+                                dumps=bytes, loads=bytes)
+                  for backend in redis_replicas()]
+        assert await caches[0].get_or_load('BTCUSDT', load) == b'depth'
+        assert await caches[1].get_or_load('BTCUSDT', load) == b'depth'
+        assert calls == 1
+        assert caches[1].stats()['shared_hits'] == 1
+
+    asyncio.run(run())
+
+
+def test_hash_fields(backend):
+    async def run():
+        assert await backend.hgetall('h') == {}
+        await backend.hset('h', '1', b'a')
+        await backend.hset('h', '2', b'b')
+        assert await backend.hget('h', '1') == b'a'
+        assert await backend.hgetall('h') == {'1': b'a', '2': b'b'}
+        await backend.hdel('h', '1')
+        assert await backend.hget('h', '1') is None
+        assert await backend.hgetall('h') == {'2': b'b'}
+        await backend.close()
+    asyncio.run(run())
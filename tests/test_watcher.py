@@ -0,0 +1,62 @@
+import asyncio
+
+import numpy as np
+import pytest
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+
+from services import watcher as watcher_module
+from services.state_backend import RedisBackend
+from services.watcher import WATCH_COLUMNS, WatchScheduler
+
+
+@pytest.fixture
+def latest(monkeypatch):
+    """fetch_latest stand-in: every symbol 3x bid-heavy at every depth"""
+    async def fetch_latest(symbols, columns, concurrency):
+        row = [300.0] * 4 + [100.0] * 4 + [100.0, 100.1]
+        return list(symbols), np.array([row] * len(symbols)).reshape(len(symbols), len(WATCH_COLUMNS))
+    monkeypatch.setattr(watcher_module, 'fetch_latest', fetch_latest)
+
+
+def replicas(sent: list, count: int = 2) -> list[WatchScheduler]:
+    server = FakeServer()
+
+    async def send(chat_id, text):
+        sent.append((chat_id, text))
+
+    return [WatchScheduler(send, path='', backend=RedisBackend(FakeRedis(server=server)),
+                           key='test:watches')
+            for _ in range(count)]
+
+
+def test_replicas_share_watches(latest):
+    async def run():
+        first, second = replicas([])
+        await first.add(1, 'BTCUSDT', '3', 30.0)
+        await first.add(1, 'ETHUSDT', 'spread', 5.0)
+        assert [watch[:2] for watch in await second.watches(1)] == [
+            ('BTCUSDT', '3'), ('ETHUSDT', 'spread')
+        ]
+        assert await second.remove(1, 'BTCUSDT') == 1
+        assert [watch[:2] for watch in await first.watches(1)] == [('ETHUSDT', 'spread')]
+
+    asyncio.run(run())
+
+
+def test_one_replica_sends_alerts(latest):
+    async def run():
+        sent = []
+        first, second = replicas(sent)
+        await second.add(7, 'BTCUSDT', '3', 30.0)
+        await first.tick()
+        await second.tick()
+        assert [chat_id for chat_id, _ in sent] == [7]
+
+        # The lease moves on once its holder stops
+        await first.stop()
+        await second.add(8, 'ETHUSDT', '1', 30.0)
+        await second.tick()
+        assert [chat_id for chat_id, _ in sent][1:] == [7, 8]
+
+    asyncio.run(run())
@@ -0,0 +1,61 @@
+import asyncio
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.filters import Command
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+
+from core.webhook import SECRET_HEADER, WebhookServer
+
+# As Telegram posts it for "/symbols" sent in a private chat
+UPDATE = {
+    'update_id': 815093312,
+    'message': {
+        'message_id': 1742,
+        'from': {'id': 5240181, 'is_bot': False, 'first_name': 'Ann', 'language_code': 'en'},
+        'chat': {'id': 5240181, 'first_name': 'Ann', 'type': 'private'},
+        'date': 1760700000,
+        'text': '/symbols',
+        'entities': [{'offset': 0, 'length': 8, 'type': 'bot_command'}],
+    },
+}
+
+
+def serve(handled: list) -> WebhookServer:
+    router = Router()
+
+    @router.message(Command('symbols'))
+    async def symbols(message: Message):
+        handled.append((message.chat.id, message.text))
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return WebhookServer(Bot('123456:test'), dp, secret='s3cret')
+
+
+def test_webhook_checks_secret_and_dispatches_updates():
+    async def run():
+        handled = []
+        server = serve(handled)
+        async with TestClient(TestServer(server.app)) as client:
+            missing = await client.post('/webhook', json=UPDATE)
+            wrong = await client.post('/webhook', json=UPDATE, headers={SECRET_HEADER: 'guess'})
+            assert (missing.status, wrong.status) == (401, 401)
+            assert server.rejected == 2 and server.received == 0
+
+            invalid = await client.post('/webhook', data=b'not json',
+                                        headers={SECRET_HEADER: 's3cret'})
+            assert invalid.status == 400
+
+            response = await client.post('/webhook', json=UPDATE, headers={SECRET_HEADER: 's3cret'})
+            assert response.status == 200
+            assert await response.json() == {'ok': True}
+            await asyncio.gather(*server._tasks)
+            assert handled == [(5240181, '/symbols')]
+            assert server.received == 1
+
+            health = await (await client.get('/healthz')).json()
+            assert health == {'status': 'ok', 'in_flight': 0, 'received': 1, 'rejected': 2}
+        await server.bot.session.close()
+
+    asyncio.run(run())